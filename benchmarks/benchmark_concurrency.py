@@ -0,0 +1,58 @@
+"""Read throughput against the number of threads, for local and HTTP stores.
+
+The HTTP server adds latency to each request, so that reads are bound by
+the number of requests in flight (as with an object store) rather than by
+decoding.
+"""
+
+import os
+from time import perf_counter
+
+import numpy as np
+
+from napari_ome_zarr._http_server import HTTPServer
+from napari_ome_zarr.config import options
+
+from .datasets import read, write_chunked_image
+
+# seconds added to each request
+LATENCY = 0.02
+
+
+class ReadThroughput:
+    params = [[1, 2, 4, 8, 16], ["local", "http"], [0, 4]]
+    param_names = ["threads", "store", "max_requests_per_host"]
+    timeout = 300
+
+    def setup_cache(self):
+        write_chunked_image("image.zarr")
+        return os.getcwd()
+
+    def setup(self, directory, threads, store, max_requests_per_host):
+        self.server = None
+        path = os.path.join(directory, "image.zarr")
+        if store == "http":
+            self.server = HTTPServer(directory, latency=LATENCY).start()
+            path = f"{self.server.url}/image.zarr"
+        self.options = options(
+            threads=threads, max_requests_per_host=max_requests_per_host
+        )
+        self.options.__enter__()
+        self.data = read(path)[0][0][0]
+
+    def teardown(self, directory, threads, store, max_requests_per_host):
+        self.options.__exit__(None, None, None)
+        if self.server is not None:
+            self.server.stop()
+
+    def time_read_full_resolution(
+        self, directory, threads, store, max_requests_per_host
+    ):
+        np.asarray(self.data)
+
+    def track_read_throughput(self, directory, threads, store, max_requests_per_host):
+        start = perf_counter()
+        np.asarray(self.data)
+        return self.data.nbytes / 1e6 / (perf_counter() - start)
+
+    track_read_throughput.unit = "MB/s"
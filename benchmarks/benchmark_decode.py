@@ -0,0 +1,43 @@
+"""Decoding chunks in threads (zarr's default) or in a process pool.
+
+The plate is compressed with zstd at level 19, so reading it is bound by
+decompression rather than I/O.
+"""
+
+import numpy as np
+from zarr.codecs import ZstdCodec
+
+from napari_ome_zarr.config import options
+
+from .datasets import read, write_plate
+
+
+class DecodeHighCompressionPlate:
+    params = [[0, 2, 4], [1, 4]]
+    param_names = ["decode_processes", "threads"]
+    timeout = 300
+
+    def setup_cache(self):
+        write_plate(
+            "plate.zarr",
+            96,
+            tile=512,
+            noise=True,
+            compressors=ZstdCodec(level=19),
+        )
+        return "plate.zarr"
+
+    setup_cache.timeout = 1200
+
+    def setup(self, path, decode_processes, threads):
+        self.options = options(decode_processes=decode_processes, threads=threads)
+        self.options.__enter__()
+        self.pyramid = read(path)[0][0]
+        # start the worker processes
+        np.asarray(self.pyramid[-1])
+
+    def teardown(self, path, decode_processes, threads):
+        self.options.__exit__(None, None, None)
+
+    def time_read_full_resolution_plane(self, path, decode_processes, threads):
+        np.asarray(self.pyramid[0][0])
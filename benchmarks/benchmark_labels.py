@@ -0,0 +1,44 @@
+import numpy as np
+
+from napari_ome_zarr.labels import (
+    colors_to_arrays,
+    label_colormap,
+    properties_to_table,
+)
+
+
+class LabelColors:
+    params = [100_000, 1_000_000]
+    param_names = ["n_labels"]
+
+    def setup(self, n_labels):
+        rng = np.random.default_rng(0)
+        rgba = rng.integers(0, 256, size=(n_labels, 4)).tolist()
+        self.color_list = [
+            {"label-value": value, "rgba": color}
+            for value, color in enumerate(rgba, start=1)
+        ]
+        self.values, self.rgba = colors_to_arrays(self.color_list)
+
+    def time_colors_to_arrays(self, n_labels):
+        colors_to_arrays(self.color_list)
+
+    def time_label_colormap(self, n_labels):
+        label_colormap(self.values, self.rgba)
+
+
+class LabelProperties:
+    params = [100_000, 1_000_000]
+    param_names = ["n_labels"]
+
+    def setup(self, n_labels):
+        self.props_list = [
+            {"label-value": value, "area": value * 2, "class": "cell", "score": 0.5}
+            for value in range(1, n_labels + 1)
+        ]
+
+    def time_properties_to_table(self, n_labels):
+        properties_to_table(self.props_list)
+
+    def peakmem_properties_to_table(self, n_labels):
+        properties_to_table(self.props_list)
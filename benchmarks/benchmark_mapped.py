@@ -0,0 +1,50 @@
+"""Scrolling through z of a local uncompressed volume, with or without mmap.
+
+Each plane spans a stack of chunks in z, that zarr reads (and copies) whole,
+while a memory-mapped chunk only reads the pages of the plane.
+"""
+
+import numpy as np
+import zarr
+
+from napari_ome_zarr.config import options
+
+from .datasets import read, write_multiscale
+
+DEPTH = 64
+
+
+class ScrollUncompressedVolume:
+    params = [[False, True]]
+    param_names = ["memory_map"]
+    timeout = 300
+
+    def setup_cache(self):
+        root = zarr.open_group("volume.zarr", mode="w")
+        write_multiscale(
+            root,
+            (DEPTH, 2048, 2048),
+            axes="zyx",
+            noise=True,
+            chunks=(16, 256, 256),
+            compressors=None,
+        )
+        return "volume.zarr"
+
+    setup_cache.timeout = 600
+
+    def setup(self, path, memory_map):
+        self.options = options(memory_map=memory_map)
+        self.options.__enter__()
+        self.data = read(path)[0][0][0]
+
+    def teardown(self, path, memory_map):
+        self.options.__exit__(None, None, None)
+
+    def time_scroll_z(self, path, memory_map):
+        for z in range(DEPTH):
+            np.asarray(self.data[z])
+
+    def peakmem_scroll_z(self, path, memory_map):
+        for z in range(DEPTH):
+            np.asarray(self.data[z])
@@ -0,0 +1,117 @@
+"""Open-time, layer construction and read throughput across OME-Zarr layouts.
+
+Datasets are generated locally by ``setup_cache`` (see ``datasets.py``).
+"""
+
+import numpy as np
+
+from .datasets import (
+    PLATE_LAYOUTS,
+    add_layers,
+    read,
+    write_bioformats2raw,
+    write_image_with_labels,
+    write_plate,
+    write_scene,
+)
+
+
+class ImageWithLabels:
+    params = [0, -1]
+    param_names = ["level"]
+    timeout = 120
+
+    def setup_cache(self):
+        write_image_with_labels("image.zarr")
+        return "image.zarr"
+
+    def time_open(self, path, level):
+        read(path)
+
+    def time_add_layers(self, path, level):
+        add_layers(read(path))
+
+    def peakmem_add_layers(self, path, level):
+        add_layers(read(path))
+
+    def setup(self, path, level):
+        self.image, self.labels = [layer[0][level] for layer in read(path)]
+
+    def time_read_image_plane(self, path, level):
+        np.asarray(self.image[0])
+
+    def time_read_labels_plane(self, path, level):
+        np.asarray(self.labels)
+
+
+class Plates:
+    params = [list(PLATE_LAYOUTS), ["dense", "sparse"]]
+    param_names = ["wells", "layout"]
+    timeout = 300
+
+    def setup_cache(self):
+        paths = {}
+        for n_wells in PLATE_LAYOUTS:
+            for layout in ("dense", "sparse"):
+                path = f"plate_{n_wells}_{layout}.zarr"
+                write_plate(path, n_wells, sparse=layout == "sparse")
+                paths[(n_wells, layout)] = path
+        return paths
+
+    setup_cache.timeout = 1200
+
+    def time_open(self, paths, wells, layout):
+        read(paths[(wells, layout)])
+
+    def time_add_layers(self, paths, wells, layout):
+        add_layers(read(paths[(wells, layout)]))
+
+    def peakmem_open(self, paths, wells, layout):
+        read(paths[(wells, layout)])
+
+    def setup(self, paths, wells, layout):
+        self.pyramid = read(paths[(wells, layout)])[0][0]
+
+    def time_read_full_resolution_plane(self, paths, wells, layout):
+        np.asarray(self.pyramid[0][0])
+
+    def time_read_lowest_resolution(self, paths, wells, layout):
+        np.asarray(self.pyramid[-1])
+
+
+class Bioformats2raw:
+    params = [1, 10, 100]
+    param_names = ["series"]
+    timeout = 120
+
+    def setup_cache(self):
+        paths = {}
+        for n_series in self.params:
+            paths[n_series] = f"bioformats2raw_{n_series}.zarr"
+            write_bioformats2raw(paths[n_series], n_series)
+        return paths
+
+    def time_open(self, paths, series):
+        read(paths[series])
+
+    def peakmem_open(self, paths, series):
+        read(paths[series])
+
+
+class Scenes:
+    params = [10, 100]
+    param_names = ["images"]
+    timeout = 120
+
+    def setup_cache(self):
+        paths = {}
+        for n_images in self.params:
+            paths[n_images] = f"scene_{n_images}.zarr"
+            write_scene(paths[n_images], n_images)
+        return paths
+
+    def time_open(self, paths, images):
+        read(paths[images])
+
+    def time_add_layers(self, paths, images):
+        add_layers(read(paths[images]))
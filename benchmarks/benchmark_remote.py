@@ -0,0 +1,81 @@
+"""Opening and reading datasets over HTTP, with added network latency.
+
+Datasets are served by a local HTTP server that adds latency to each request
+and counts requests, so that the number of requests can be tracked too.
+"""
+
+import os
+
+import numpy as np
+import zarr
+
+from napari_ome_zarr._http_server import HTTPServer
+from napari_ome_zarr.config import options
+
+from .datasets import read, write_image_with_labels, write_multiscale, write_plate
+
+# seconds added to each request
+LATENCY = 0.02
+
+
+class RemoteOpen:
+    params = ["image.zarr", "plate.zarr"]
+    param_names = ["dataset"]
+    timeout = 300
+
+    def setup_cache(self):
+        write_image_with_labels("image.zarr", size=1024, n_labels=1000)
+        write_plate("plate.zarr", 96)
+        return os.getcwd()
+
+    def setup(self, directory, dataset):
+        self.server = HTTPServer(directory, latency=LATENCY).start()
+        self.url = f"{self.server.url}/{dataset}"
+
+    def teardown(self, directory, dataset):
+        self.server.stop()
+
+    def time_open(self, directory, dataset):
+        read(self.url)
+
+    def track_open_requests(self, directory, dataset):
+        self.server.reset_counts()
+        read(self.url)
+        return self.server.request_count
+
+    track_open_requests.unit = "requests"
+
+    def time_read_lowest_resolution(self, directory, dataset):
+        np.asarray(read(self.url)[0][0][-1])
+
+    def track_read_lowest_resolution_requests(self, directory, dataset):
+        self.server.reset_counts()
+        np.asarray(read(self.url)[0][0][-1])
+        return self.server.request_count
+
+    track_read_lowest_resolution_requests.unit = "requests"
+
+
+class RemoteOpenMany:
+    """Open 24 images at once (as when dropping them onto napari together)."""
+
+    params = [1, 8]
+    param_names = ["max_concurrent_opens"]
+    timeout = 300
+
+    def setup_cache(self):
+        for index in range(24):
+            root = zarr.open_group(f"image_{index}.zarr", mode="w")
+            write_multiscale(root, (2, 256, 256))
+        return os.getcwd()
+
+    def setup(self, directory, max_concurrent_opens):
+        self.server = HTTPServer(directory, latency=LATENCY).start()
+        self.urls = [f"{self.server.url}/image_{index}.zarr" for index in range(24)]
+
+    def teardown(self, directory, max_concurrent_opens):
+        self.server.stop()
+
+    def time_open(self, directory, max_concurrent_opens):
+        with options(max_concurrent_opens=max_concurrent_opens):
+            read(self.urls)
@@ -0,0 +1,216 @@
+"""Synthetic OME-Zarr datasets for the benchmarks."""
+
+import os
+from typing import Any, List, Tuple
+
+import numpy as np
+import zarr
+from napari.components import ViewerModel
+from ome_zarr.writer import (
+    write_image,
+    write_labels,
+    write_multiscales_metadata,
+    write_plate_metadata,
+    write_well_metadata,
+)
+
+from napari_ome_zarr import napari_get_reader
+
+# rows x columns of standard plate formats
+PLATE_LAYOUTS = {24: (4, 6), 96: (8, 12), 384: (16, 24), 1536: (32, 48)}
+
+
+def read(path: str | List[str]) -> List[Tuple]:
+    """Open a dataset (or several) the way napari does, returning the layer data."""
+    return napari_get_reader(path)()
+
+
+def add_layers(layers: List[Tuple]) -> ViewerModel:
+    """Create napari layers (without a GUI) from the reader's layer data."""
+    viewer = ViewerModel()
+    for data, metadata, layer_type in layers:
+        getattr(viewer, f"add_{layer_type}")(data, **metadata)
+    return viewer
+
+
+def write_multiscale(
+    group: zarr.Group,
+    shape: Tuple[int, ...],
+    levels: int = 2,
+    dtype: Any = np.uint8,
+    axes: str = "cyx",
+    value: int = 1,
+    noise: bool = False,
+    **kwargs: Any,
+) -> None:
+    """
+    Write a pyramid of constant arrays (or of noise around the value, that only
+    compresses well at high compression levels), halving y and x at each level.
+    ``kwargs`` are passed to ``create_array``, e.g. ``compressors``.
+    """
+    rng = np.random.default_rng(value)
+    datasets = []
+    for level in range(levels):
+        factor = 2**level
+        level_shape = shape[:-2] + tuple(max(1, s // factor) for s in shape[-2:])
+        data = np.full(level_shape, value, dtype=dtype)
+        if noise:
+            data += rng.integers(0, 8, size=level_shape, dtype=dtype)
+        group.create_array(str(level), data=data, **kwargs)
+        scale = [1.0] * (len(shape) - 2) + [float(factor)] * 2
+        datasets.append(
+            {
+                "path": str(level),
+                "coordinateTransformations": [{"type": "scale", "scale": scale}],
+            }
+        )
+    write_multiscales_metadata(group, datasets, axes=axes)
+
+
+def write_chunked_image(path: str, size: int = 4096, chunk: int = 256) -> None:
+    """A single-channel random (so compressible only by the codec) image."""
+    rng = np.random.default_rng(0)
+    root = zarr.open_group(path, mode="w")
+    image = rng.integers(0, 16, size=(size, size), dtype=np.uint8)
+    write_image(
+        image=image, group=root, axes="yx", storage_options={"chunks": (chunk, chunk)}
+    )
+
+
+def write_image_with_labels(
+    path: str, size: int = 2048, channels: int = 3, n_labels: int = 10_000
+) -> None:
+    """A multi-channel image, with a label image that has many properties."""
+    rng = np.random.default_rng(0)
+    root = zarr.open_group(path, mode="w")
+    image = rng.integers(0, 255, size=(channels, size, size), dtype=np.uint8)
+    write_image(image=image, group=root, axes="cyx")
+
+    side = int(np.ceil(np.sqrt(n_labels)))
+    labels = np.arange(1, side * side + 1, dtype=np.uint32).reshape((side, side))
+    labels[labels > n_labels] = 0
+    labels = np.kron(labels, np.ones((size // side + 1,) * 2, dtype=np.uint32))
+    label_metadata = {
+        "colors": [
+            {"label-value": value, "rgba": [int(c) for c in rgba]}
+            for value, rgba in enumerate(
+                rng.integers(0, 256, size=(n_labels, 4)), start=1
+            )
+        ],
+        "properties": [
+            {"label-value": value, "area": value % 100, "class": "cell", "score": 0.5}
+            for value in range(1, n_labels + 1)
+        ],
+    }
+    write_labels(
+        labels=labels[:size, :size],
+        group=root,
+        name="cells",
+        axes="yx",
+        label_metadata=label_metadata,
+    )
+
+
+def write_plate(
+    path: str,
+    n_wells: int,
+    sparse: bool = False,
+    tile: int = 64,
+    fields: int = 1,
+    **kwargs: Any,
+) -> None:
+    """
+    A plate with small images in every well (or in every 10th, if sparse).
+    ``kwargs`` are passed to ``write_multiscale``.
+    """
+    n_rows, n_cols = PLATE_LAYOUTS[n_wells]
+    row_names = [
+        chr(ord("A") + r) if r < 26 else f"A{chr(ord('A') + r - 26)}"
+        for r in range(n_rows)
+    ]
+    col_names = [str(c + 1) for c in range(n_cols)]
+    well_paths = [f"{row}/{col}" for row in row_names for col in col_names]
+    if sparse:
+        well_paths = well_paths[::10]
+
+    root = zarr.open_group(path, mode="w")
+    write_plate_metadata(root, row_names, col_names, well_paths)
+    for index, well_path in enumerate(well_paths):
+        well_group = root.require_group(well_path)
+        field_paths = [str(field) for field in range(fields)]
+        write_well_metadata(well_group, field_paths)
+        for field in field_paths:
+            write_multiscale(
+                well_group.require_group(field),
+                (2, tile, tile),
+                value=index % 255,
+                **kwargs,
+            )
+
+
+def write_bioformats2raw(path: str, n_series: int, size: int = 256) -> None:
+    """A bioformats2raw layout with several series (images)."""
+    root = zarr.open_group(path, mode="w")
+    root.attrs["ome"] = {"version": "0.5", "bioformats2raw.layout": 3}
+    images = []
+    for series in range(n_series):
+        write_multiscale(root.require_group(str(series)), (2, size, size))
+        images.append(f'<Image ID="Image:{series}" Name="series {series}"/>')
+    os.makedirs(os.path.join(path, "OME"), exist_ok=True)
+    with open(os.path.join(path, "OME", "METADATA.ome.xml"), "w") as f:
+        f.write(
+            '<OME xmlns="http://www.openmicroscopy.org/Schemas/OME/2016-06">'
+            + "".join(images)
+            + "</OME>"
+        )
+
+
+def write_scene(path: str, n_images: int, size: int = 256) -> None:
+    """A scene of images placed side by side, with coordinateTransformations."""
+    root = zarr.open_group(path, mode="w")
+    transforms = []
+    for index in range(n_images):
+        image_path = f"image_{index}.zarr"
+        image = root.require_group(image_path)
+        image.create_array("s0", data=np.full((size, size), index, dtype=np.uint8))
+        image.attrs["ome"] = {
+            "version": "0.6",
+            "multiscales": [
+                {
+                    "coordinateSystems": [
+                        {
+                            "name": "physical",
+                            "axes": [
+                                {"name": "y", "type": "space"},
+                                {"name": "x", "type": "space"},
+                            ],
+                        }
+                    ],
+                    "datasets": [
+                        {
+                            "path": "s0",
+                            "coordinateTransformations": [
+                                {
+                                    "type": "scale",
+                                    "scale": [1.0, 1.0],
+                                    "input": {"path": "s0", "name": "s0"},
+                                    "output": {"name": "physical"},
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ],
+        }
+        transforms.append(
+            {
+                "type": "translation",
+                "translation": [0.0, float(index * size)],
+                "input": {"path": image_path, "name": "physical"},
+                "output": {"name": "world"},
+            }
+        )
+    root.attrs["ome"] = {
+        "version": "0.6",
+        "scene": {"coordinateTransformations": transforms},
+    }
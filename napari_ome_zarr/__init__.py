@@ -5,3 +5,4 @@ except ImportError:
 
 
 from ._reader import napari_get_reader  # noqa
+from .async_reader import read_ome_zarr_async  # noqa
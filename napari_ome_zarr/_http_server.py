@@ -0,0 +1,218 @@
+"""A local HTTP server, for the tests and benchmarks of reads of remote data.
+
+Serves a directory, optionally adding latency to each request and limiting the
+bandwidth, and counts the requests it receives.
+"""
+
+import functools
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, BinaryIO
+
+# bytes written between bandwidth-limiting sleeps
+_BLOCK_SIZE = 64 * 1024
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    server: "_Server"
+    # keep connections open between requests
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def handle_one_request(self) -> None:
+        # (not counted in flight while waiting for a request on an idle connection)
+        self._started = False
+        try:
+            super().handle_one_request()
+        finally:
+            if self._started:
+                self.server.end_request()
+
+    def parse_request(self) -> bool:
+        if super().parse_request():
+            self.server.start_request()
+            self._started = True
+            return True
+        return False
+
+    def send_error(self, code: int, *args: Any, **kwargs: Any) -> None:
+        if code != 404:
+            return super().send_error(code, *args, **kwargs)
+        # like object stores, keep the connection open after a missing key
+        # (zarr looks for the metadata files of each format)
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_head(self) -> BinaryIO | None:
+        self.server.record(self.command, self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self._byte_range: tuple[int, int] | None = None
+        range_header = self.headers.get("Range")
+        if range_header is None or not range_header.startswith("bytes="):
+            return super().send_head()
+
+        # Support single byte ranges (used for partial reads, e.g. of shards)
+        path = self.translate_path(self.path)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        size = f.seek(0, 2)
+        start_str, end_str = range_header[len("bytes=") :].split("-")
+        if start_str:
+            start = int(start_str)
+            end = min(int(end_str), size - 1) if end_str else size - 1
+        else:
+            start, end = max(size - int(end_str), 0), size - 1
+        f.seek(start)
+        self._byte_range = (start, end)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        return f
+
+    def copyfile(self, source: BinaryIO, outputfile: BinaryIO) -> None:  # type: ignore
+        remaining = None
+        if self._byte_range is not None:
+            remaining = self._byte_range[1] - self._byte_range[0] + 1
+        while remaining is None or remaining > 0:
+            size = _BLOCK_SIZE if remaining is None else min(_BLOCK_SIZE, remaining)
+            block = source.read(size)
+            if not block:
+                break
+            # (before writing, so the last block doesn't arrive early)
+            if self.server.bandwidth:
+                time.sleep(len(block) / self.server.bandwidth)
+            outputfile.write(block)
+            self.server.record_bytes(len(block))
+            if remaining is not None:
+                remaining -= len(block)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    latency: float = 0.0
+    bandwidth: float | None = None
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = 0
+        self.sockets: set = set()
+
+    def get_request(self) -> Any:
+        request, address = super().get_request()
+        with self.lock:
+            self.connections += 1
+            self.sockets.add(request)
+        return request, address
+
+    def shutdown_request(self, request: Any) -> None:
+        with self.lock:
+            self.sockets.discard(request)
+        super().shutdown_request(request)
+
+    def close_connections(self) -> None:
+        with self.lock:
+            sockets = list(self.sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start_request(self) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end_request(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+    def record(self, method: str, path: str) -> None:
+        with self.lock:
+            self.requests[(method, path)] += 1
+
+    def record_bytes(self, size: int) -> None:
+        with self.lock:
+            self.bytes_sent += size
+
+
+class HTTPServer:
+    """
+    Serve ``directory`` over HTTP at ``url``, in a background thread.
+
+    ``latency`` (seconds) is added to every request and ``bandwidth`` (bytes
+    per second) limits the speed each response is sent at. Use as a context
+    manager, or call start() and stop().
+    """
+
+    def __init__(
+        self, directory: str, latency: float = 0.0, bandwidth: float | None = None
+    ) -> None:
+        handler = functools.partial(_Handler, directory=str(directory))
+        self._server = _Server(("127.0.0.1", 0), handler)
+        self._server.latency = latency
+        self._server.bandwidth = bandwidth
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def requests(self) -> Counter:
+        """Number of requests received, by (method, path)."""
+        return self._server.requests
+
+    @property
+    def request_count(self) -> int:
+        return sum(self._server.requests.values())
+
+    @property
+    def bytes_sent(self) -> int:
+        return self._server.bytes_sent
+
+    @property
+    def max_in_flight(self) -> int:
+        """Most requests that were being handled at the same time."""
+        return self._server.max_in_flight
+
+    @property
+    def connections(self) -> int:
+        """Number of connections accepted."""
+        return self._server.connections
+
+    def reset_counts(self) -> None:
+        with self._server.lock:
+            self._server.connections = 0
+            self._server.requests.clear()
+            self._server.bytes_sent = 0
+            self._server.max_in_flight = self._server.in_flight
+
+    def start(self) -> "HTTPServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.close_connections()
+        self._server.server_close()
+
+    def __enter__(self) -> "HTTPServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
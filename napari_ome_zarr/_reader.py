@@ -4,30 +4,97 @@ It implements the ``napari_get_reader`` hook specification, (to create a reader
 """
 
 import warnings
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List
 
-import zarr
+import pint
+from zarr import Group
+from zarr.core.sync import sync
 
-from .ome_zarr_reader import read_ome_zarr
+from .async_reader import read_group_async
+from .config import get_option
+from .progressive import progressive_reader
+from .store import open_group, open_groups
+from .tracing import profile
 
 
 def napari_get_reader(path: str | list) -> Callable | None:
     """Returns a reader for supported paths that include IDR ID.
 
     - URL of the form: https://livingobjects.ebi.ac.uk/idr/zarr/v0.1/ID.zarr/
+
+    A list of several paths is opened concurrently, returning the layers of
+    all of them.
     """
-    if isinstance(path, list):
-        if len(path) > 1:
-            warnings.warn("more than one path is not currently supported")
-        path = path[0]
+    if isinstance(path, list) and len(path) == 1:
+        path = str(path[0])
+    reader = _reader(path)
+    report_path = get_option("profile")
+    if reader is not None and report_path:
+        return _profiled_reader(path, report_path)
+    return reader
 
-    group = None
+
+def _reader(path: str | List[str]) -> Callable | None:
+    # the reader of one path, or of several paths opened concurrently
+    if isinstance(path, list):
+        return _multi_path_reader(path)
     try:
-        group = zarr.open_group(path, mode="r")
+        group = open_group(path)
     except Exception as e:
         warnings.warn(f"Failed to open Zarr group: {e}")
         return None
+    return _root_reader(group)
+
+
+def _root_reader(group: Group) -> Callable:
+    if get_option("progressive"):
+        return progressive_reader(group)
+    return _group_reader(group)
+
+
+def _group_reader(group: Group) -> Callable:
+    def f(*args: Any, **kwargs: Any) -> list:
+        return sync(read_group_async(group))
+
+    return f
+
+
+def _multi_path_reader(paths: List[str]) -> Callable | None:
+    limit = get_option("max_concurrent_opens")
+    readers: List[Callable] = []
+    for path, group in zip(paths, open_groups(paths, limit)):
+        if isinstance(group, Exception):
+            warnings.warn(f"Failed to open Zarr group {path}: {group}")
+        else:
+            readers.append(_root_reader(group))
+    if not readers:
+        return None
+
+    def f(*args: Any, **kwargs: Any) -> list:
+        if get_option("progressive"):
+            # quick, and starts napari workers: in this thread
+            layer_lists = [reader(*args, **kwargs) for reader in readers]
+        else:
+            # pint builds its unit registry (used by napari transforms) on first
+            # use, which isn't thread-safe
+            pint.get_application_registry().pixel
+            with ThreadPoolExecutor(limit) as executor:
+                layer_lists = list(
+                    executor.map(lambda reader: reader(*args, **kwargs), readers)
+                )
+        return [layer for layers in layer_lists for layer in layers]
+
+    return f
+
+
+def _profiled_reader(path: str | List[str], report_path: str) -> Callable:
+    # Open and read again inside a profile, so that the report includes
+    # opening the root group(s) (and their store requests), with the same
+    # reader as without a profile (e.g. progressive)
+    def f(*args: Any, **kwargs: Any) -> list:
+        with profile(report_path):
+            reader = _reader(path)
+            return reader(*args, **kwargs) if reader is not None else []
 
-    if group is not None:
-        return read_ome_zarr(group)
-    return None
+    return f
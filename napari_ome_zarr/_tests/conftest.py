@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pytest
+from ome_zarr.data import astronaut, create_zarr
+
+from napari_ome_zarr._http_server import HTTPServer
+
+
+@pytest.fixture
+def image_path(tmp_path: Path) -> Path:
+    """An OME-Zarr image (the astronaut) with a label image, in tmp_path."""
+    path = tmp_path / "image.zarr"
+    path.mkdir()
+    create_zarr(str(path), method=astronaut, label_name="astronaut")
+    return path
+
+
+@pytest.fixture
+def http_server():
+    """
+    Factory to serve a local directory over HTTP, e.g.
+    ``server = http_server(tmp_path, latency=0.01, bandwidth=1e6)``.
+    Servers are stopped at the end of the test.
+    """
+    servers = []
+
+    def serve(directory, latency=0.0, bandwidth=None):
+        server = HTTPServer(directory, latency=latency, bandwidth=bandwidth).start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.stop()
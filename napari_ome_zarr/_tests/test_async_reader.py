@@ -0,0 +1,90 @@
+import asyncio
+from pathlib import Path
+
+import numpy as np
+import zarr
+from ome_zarr.writer import write_image, write_plate_metadata, write_well_metadata
+
+from napari_ome_zarr._reader import napari_get_reader
+from napari_ome_zarr.async_reader import read_ome_zarr_async
+from napari_ome_zarr.config import options
+
+
+def test_read_async(image_path):
+    layers = asyncio.run(read_ome_zarr_async(str(image_path)))
+    sync_layers = napari_get_reader(str(image_path))()
+    assert [layer[2] for layer in layers] == ["image", "labels"]
+    for (data, metadata, _), (sync_data, sync_metadata, _) in zip(layers, sync_layers):
+        assert metadata["name"] == sync_metadata["name"]
+        np.testing.assert_array_equal(data[-1], sync_data[-1])
+
+
+def test_read_async_does_not_block(image_path, http_server):
+    server = http_server(image_path.parent, latency=0.02)
+    ticks = []
+
+    async def tick() -> None:
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.005)
+
+    async def main() -> list:
+        ticker = asyncio.create_task(tick())
+        layers = await read_ome_zarr_async(f"{server.url}/image.zarr")
+        ticker.cancel()
+        return layers
+
+    layers = asyncio.run(main())
+    assert len(layers) == 2
+    # the event loop kept running while the metadata was read
+    assert len(ticks) > 5
+    # and each metadata document was only requested once
+    assert max(server.requests.values()) == 1
+
+
+def test_read_plate_async(tmp_path: Path, http_server):
+    root = zarr.open_group(str(tmp_path / "plate.zarr"), mode="w")
+    well_paths = ["A/1", "A/2", "B/1"]
+    write_plate_metadata(root, ["A", "B"], ["1", "2"], well_paths)
+    for well_path in well_paths:
+        well_group = root.require_group(well_path)
+        write_well_metadata(well_group, ["0"])
+        write_image(
+            image=np.ones((1, 16, 16), dtype=np.uint8),
+            group=well_group.require_group("0"),
+            axes="cyx",
+        )
+    server = http_server(tmp_path)
+
+    [(data, _, layer_type)] = asyncio.run(
+        read_ome_zarr_async(f"{server.url}/plate.zarr")
+    )
+    assert layer_type == "image"
+    assert data[0].shape == (1, 32, 32)
+    assert max(server.requests.values()) == 1
+
+
+def test_metadata_snapshot(image_path, http_server):
+    server = http_server(image_path.parent)
+    url = f"{server.url}/image.zarr"
+    cache_dir = image_path.parent / "cache"
+
+    with options(metadata_snapshot=True, cache_dir=str(cache_dir)):
+        layers = napari_get_reader(url)()
+        assert len(list(cache_dir.glob("metadata-snapshots/*.json"))) == 1
+
+        # opened again, only the metadata of the root group is requested (by
+        # zarr, when opening it)
+        server.reset_counts()
+        reopened = napari_get_reader(url)()
+        assert all(path.count("/") == 2 for _, path in server.requests)
+        for (data, metadata, _), (old_data, old_metadata, _) in zip(reopened, layers):
+            assert metadata["name"] == old_metadata["name"]
+            np.testing.assert_array_equal(data[-1], old_data[-1])
+
+        # the snapshot isn't used once the root metadata changes
+        root = zarr.open_group(str(image_path), mode="a")
+        root.attrs["changed"] = True
+        server.reset_counts()
+        assert len(napari_get_reader(url)()) == 2
+        assert server.request_count > 1
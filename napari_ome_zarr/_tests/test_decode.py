@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import zarr
+from zarr.codecs import BloscCodec, GzipCodec, ShardingCodec, ZstdCodec
+from zarr.core.sync import _get_loop
+
+from napari_ome_zarr.arrays import from_zarr
+from napari_ome_zarr.config import options
+from napari_ome_zarr.decode import ProcessDecodedArray, codec_configs
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 1000, size=(50, 45)).astype(np.uint16)
+    # a chunk of fill values, that isn't written
+    data[:8, :8] = 0
+    return data
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"compressors": ZstdCodec(level=19)},
+        {"compressors": BloscCodec(cname="zstd", clevel=9)},
+        {"compressors": [GzipCodec()]},
+        {"compressors": None},
+        {"zarr_format": 2},
+    ],
+)
+def test_decode_in_processes(tmp_path, monkeypatch, data, kwargs):
+    array = zarr.create_array(
+        tmp_path / "data.zarr",
+        shape=data.shape,
+        chunks=(8, 8),
+        dtype=data.dtype,
+        **kwargs,
+    )
+    array[:] = data
+    decoded = []
+    decode = ProcessDecodedArray._decode
+    monkeypatch.setattr(
+        ProcessDecodedArray,
+        "_decode",
+        lambda self, buffers: decoded.append(len(buffers)) or decode(self, buffers),
+    )
+
+    # (not memory mapped, when uncompressed)
+    with options(decode_processes=2, memory_map=False):
+        dask_data = from_zarr(array)
+    np.testing.assert_array_equal(dask_data, data)
+    assert sum(decoded) == 7 * 6
+    for key in [
+        np.s_[3:30, 7:40],
+        np.s_[5, ::-3],
+        np.s_[20:3:-2, 44],
+        np.s_[8:16, 16:24],
+        np.s_[::7],
+    ]:
+        np.testing.assert_array_equal(dask_data[key], data[key])
+
+
+def test_unsupported_codecs(tmp_path, data):
+    array = zarr.create_array(
+        tmp_path / "data.zarr",
+        shape=data.shape,
+        chunks=(8, 8),
+        shards=(16, 16),
+        dtype=data.dtype,
+    )
+    array[:] = data
+    assert isinstance(array.metadata.codecs[0], ShardingCodec)
+    assert codec_configs(array) is None
+
+    # read by zarr as usual
+    # (not memory mapped, when uncompressed)
+    with options(decode_processes=2, memory_map=False):
+        dask_data = from_zarr(array)
+    np.testing.assert_array_equal(dask_data, data)
+
+
+def test_decode_threads(tmp_path, data):
+    array = zarr.create_array(tmp_path / "data.zarr", data=data, chunks=(8, 8))
+    loop = _get_loop()
+    executors = []
+    for threads in (2, 3):
+        with options(decode_threads=threads):
+            np.testing.assert_array_equal(from_zarr(array).compute(), data)
+        executors.append(loop._default_executor)
+        assert executors[-1]._max_workers == threads
+    # the executor that was replaced is shut down
+    assert executors[0]._shutdown
+    assert not executors[1]._shutdown
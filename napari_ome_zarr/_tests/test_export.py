@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pytest
+import zarr
+from ome_zarr.writer import write_image, write_plate_metadata, write_well_metadata
+
+from napari_ome_zarr import export
+from napari_ome_zarr._reader import napari_get_reader
+from napari_ome_zarr.ome_zarr_reader import Multiscales, Plate
+
+
+def test_export_image(image_path, tmp_path):
+    source = zarr.open_group(image_path, mode="r")
+    dest = tmp_path / "region.zarr"
+    region = (slice(None), slice(256, 512), slice(128, 448))
+    Multiscales(source).export(dest, region=region, levels=[0, 1], channels=[2, 0])
+
+    group = zarr.open_group(dest, mode="r")
+    datasets = group.attrs["ome"]["multiscales"][0]["datasets"]
+    assert [ds["path"] for ds in datasets] == ["s0", "s1"]
+    np.testing.assert_array_equal(
+        group["s0"][:], source["s0"][[2, 0], 256:512, 128:448]
+    )
+    np.testing.assert_array_equal(group["s1"][:], source["s1"][[2, 0], 128:256, 64:224])
+    channels = group.attrs["ome"]["omero"]["channels"]
+    assert [c["label"] for c in channels] == ["Blue", "Red"]
+
+    # the region is translated to where it was in the source image
+    source_datasets = source.attrs["ome"]["multiscales"][0]["datasets"]
+    for dataset, source_dataset in zip(datasets, source_datasets):
+        scale, translation = dataset["coordinateTransformations"]
+        source_scale, source_translation = source_dataset["coordinateTransformations"]
+        assert scale == source_scale
+        np.testing.assert_allclose(
+            translation["translation"],
+            np.add(source_translation["translation"], [0, 256, 128]),
+        )
+
+    [(data, _, _)] = napari_get_reader(str(dest))()
+    assert [d.shape for d in data] == [(2, 256, 320), (2, 128, 160)]
+
+
+def test_export_sharded(tmp_path):
+    source = zarr.open_group(tmp_path / "sharded.zarr", mode="w", zarr_format=3)
+    data = np.arange(512 * 512, dtype=np.uint16).reshape((512, 512))
+    source.create_array("s0", data=data, chunks=(64, 64), shards=(256, 256))
+    axes = [{"name": "y", "type": "space"}, {"name": "x", "type": "space"}]
+    scale = {"type": "scale", "scale": [1.0, 1.0]}
+    source.attrs["ome"] = {
+        "version": "0.5",
+        "multiscales": [
+            {
+                "axes": axes,
+                "datasets": [{"path": "s0", "coordinateTransformations": [scale]}],
+            }
+        ],
+    }
+
+    # a region smaller than a shard, that isn't a whole number of chunks
+    dest = tmp_path / "region.zarr"
+    region = (slice(10, 110), slice(300, 400))
+    group = Multiscales(source).export(dest, region=region)
+    assert group["s0"].shards == (128, 128)
+    assert group["s0"].chunks == (64, 64)
+    np.testing.assert_array_equal(group["s0"][:], data[10:110, 300:400])
+
+
+def test_export_resumes(image_path, tmp_path, monkeypatch):
+    source = zarr.open_group(image_path, mode="r")
+    dest = tmp_path / "region.zarr"
+    copy_block = export._copy_block
+    copied = []
+
+    def interrupted(*args):
+        if len(copied) == 20:
+            raise KeyboardInterrupt
+        copy_block(*args)
+        copied.append(args[2])
+
+    monkeypatch.setattr(export, "_copy_block", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        export.export_image(source, dest, levels=[0], threads=1)
+    progress = json.loads((dest / export.PROGRESS_FILE).read_text())
+    assert not progress["complete"]
+    assert len(progress["done"]["s0"]) == 20
+
+    # only the chunks that are missing are copied
+    monkeypatch.setattr(export, "_copy_block", copy_block)
+    group = export.export_image(source, dest, levels=[0])
+    np.testing.assert_array_equal(group["s0"][:], source["s0"][:])
+    progress = json.loads((dest / export.PROGRESS_FILE).read_text())
+    assert progress["complete"]
+
+    with pytest.raises(ValueError, match="other parameters"):
+        export.export_image(source, dest, levels=[1])
+    group = export.export_image(source, dest, levels=[1], overwrite=True)
+    assert list(group.array_keys()) == ["s1"]
+
+
+def test_export_plate(tmp_path):
+    plate_path = tmp_path / "plate.zarr"
+    root = zarr.open_group(plate_path)
+    well_paths = ["A/1", "A/2", "B/1"]
+    write_plate_metadata(root, ["A", "B"], ["1", "2"], well_paths)
+    for wi, well_path in enumerate(well_paths):
+        row, col = well_path.split("/")
+        well_group = root.require_group(row).require_group(col)
+        write_well_metadata(well_group, ["0", "1"])
+        for fi in range(2):
+            data = np.full((2, 64, 96), wi * 10 + fi, dtype=np.uint8)
+            write_image(data, well_group.require_group(str(fi)), axes="cyx")
+
+    dest = tmp_path / "wells.zarr"
+    Plate(zarr.open_group(plate_path, mode="r")).export(
+        dest, wells=["B/1", "A/2"], fields=[1], region=(slice(None), slice(0, 32))
+    )
+
+    group = zarr.open_group(dest, mode="r")
+    plate = group.attrs["ome"]["plate"]
+    assert [w["path"] for w in plate["wells"]] == ["A/2", "B/1"]
+    assert [r["name"] for r in plate["rows"]] == ["A", "B"]
+    assert [i["path"] for i in group["A/2"].attrs["ome"]["well"]["images"]] == ["1"]
+    assert "A/1" not in group
+    np.testing.assert_array_equal(group["B/1/1/s0"][:], np.full((2, 32, 96), 21))
+
+    [(data, _, _)] = napari_get_reader(str(dest))()
+    assert data[0].shape == (2, 64, 192)
@@ -0,0 +1,225 @@
+import logging
+from pathlib import Path
+
+import dask.array as da
+import numpy as np
+import pandas as pd
+import zarr
+from napari.utils.colormaps import DirectLabelColormap
+from ome_zarr.writer import write_image, write_labels
+
+from napari_ome_zarr import ome_zarr_reader
+from napari_ome_zarr._reader import napari_get_reader
+from napari_ome_zarr.config import options
+from napari_ome_zarr.labels import (
+    compute_label_index,
+    narrow_labels,
+    properties_to_table,
+    read_properties_table,
+)
+from napari_ome_zarr.ome_zarr_reader import Label
+
+
+def test_properties_to_table():
+    props_list = [
+        {"label-value": 1, "area": 10, "name": "cell", "score": 0.5, "ok": True},
+        {"label-value": 2, "area": 20, "score": 1, "ok": False},
+        {"label-value": 3, "name": "nucleus", "score": 2.5, "ok": True},
+        {"label-value": 2, "area": 22, "score": 1, "ok": False},
+    ]
+    table = properties_to_table(props_list)
+    assert list(table.columns) == ["area", "name", "score", "ok", "index"]
+    # duplicate label-value: last entry wins, order of first appearance kept
+    assert table["index"].tolist() == [1, 2, 3]
+    assert table["area"].dtype == "Int64"
+    assert table["area"].tolist() == [10, 22, pd.NA]
+    assert table["name"].dtype == "string"
+    assert table["name"].isna().tolist() == [False, True, False]
+    assert table["score"].dtype == np.float64
+    assert table["ok"].dtype == bool
+
+
+def write_image_with_label(path: Path, properties: list | None = None) -> zarr.Group:
+    root = zarr.open_group(str(path), mode="w")
+    write_image(image=np.zeros((8, 8), dtype=np.uint8), group=root, axes="yx")
+    label_metadata = {"properties": properties} if properties else None
+    write_labels(
+        labels=np.arange(64, dtype=np.uint16).reshape((8, 8)),
+        group=root,
+        name="lbl",
+        axes="yx",
+        label_metadata=label_metadata,
+    )
+    return root["labels/lbl"]
+
+
+def test_label_properties(tmp_path: Path):
+    path = tmp_path / "props.zarr"
+    write_image_with_label(path, [{"label-value": v, "area": v * 2} for v in (1, 2)])
+
+    layers = napari_get_reader(str(path))()
+    label = next(layer for layer in layers if layer[2] == "labels")
+    properties = label[1]["properties"]
+    assert properties["index"].tolist() == [1, 2]
+    assert properties["area"].tolist() == [2, 4]
+
+
+def test_label_properties_table(tmp_path: Path, caplog, monkeypatch):
+    path = tmp_path / "props_table.zarr"
+    label_group = write_image_with_label(path, [{"label-value": 1, "area": 0}])
+    # columnar table takes precedence over the "image-label" properties
+    table = label_group.create_group("properties")
+    values = np.arange(1, 64, dtype=np.uint16)
+    table.create_array("label-value", data=values)
+    table.create_array("area", data=values.astype(np.float32) * 2)
+    # a column that doesn't have a value for each label is skipped
+    table.create_array("short", data=values[:10])
+
+    reads = []
+
+    def counting_read(label_group):
+        reads.append(label_group.path)
+        return read_properties_table(label_group)
+
+    monkeypatch.setattr(ome_zarr_reader, "read_properties_table", counting_read)
+    with caplog.at_level(logging.WARNING):
+        layers = napari_get_reader(str(path))()
+    assert len(reads) == 1
+    # once per label, though its metadata is read more than once
+    label_node = Label(label_group)
+    label_node.add_parent_transform({"type": "scale", "scale": [1, 1]}, None)
+    label_node.metadata()
+    assert len(reads) == 2
+    assert "Property short has 10 values for 63 labels" in caplog.text
+    label = next(layer for layer in layers if layer[2] == "labels")
+    properties = label[1]["properties"]
+    assert len(properties) == 63
+    assert properties["area"].dtype == np.float32
+    assert "short" not in properties
+    np.testing.assert_array_equal(properties["index"], values)
+
+
+def test_label_colormap(tmp_path: Path):
+    path = tmp_path / "colors.zarr"
+    colors = [
+        {"label-value": 1, "rgba": [255, 0, 0, 255]},
+        {"label-value": 2, "rgba": [0, 0, 255, 128]},
+        {"label-value": "3", "rgba": [0, 255, 0, 255]},  # invalid, skipped
+        {"label-value": 4},  # no color, skipped
+    ]
+    root = zarr.open_group(str(path), mode="w")
+    write_image(image=np.zeros((8, 8), dtype=np.uint8), group=root, axes="yx")
+    write_labels(
+        labels=np.zeros((8, 8), dtype=np.uint8),
+        group=root,
+        name="lbl",
+        axes="yx",
+        label_metadata={"colors": colors},
+    )
+
+    layers = napari_get_reader(str(path))()
+    label = next(layer for layer in layers if layer[2] == "labels")
+    colormap = label[1]["colormap"]
+    assert isinstance(colormap, DirectLabelColormap)
+    mapped = colormap.map(np.array([1, 2, 3, 4]))
+    np.testing.assert_allclose(mapped[0], [1, 0, 0, 1])
+    np.testing.assert_allclose(mapped[1], [0, 0, 1, 128 / 255])
+    # labels without a valid color are transparent
+    assert not mapped[2:].any()
+
+
+def test_compute_label_index():
+    data = np.zeros((20, 30), dtype=np.uint32)
+    data[2:5, 3:25] = 1  # spans several chunks
+    data[10, 10] = 2
+    data[12:20, 0:4] = 7
+    index = compute_label_index(da.from_array(data, chunks=(7, 8)), (1, 1))
+
+    assert index.labels.tolist() == [1, 2, 7]
+    assert 0 not in index
+    for label in (1, 2, 7):
+        coords = np.argwhere(data == label)
+        assert index.count(label) == len(coords)
+        bbox_min, bbox_max = index.bbox(label)
+        np.testing.assert_array_equal(bbox_min, coords.min(axis=0))
+        np.testing.assert_array_equal(bbox_max, coords.max(axis=0) + 1)
+        np.testing.assert_allclose(index.centroid(label), coords.mean(axis=0))
+
+
+def test_label_index(tmp_path: Path):
+    path = tmp_path / "index.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    write_image(image=np.zeros((64, 64), dtype=np.uint8), group=root, axes="yx")
+    labels = np.zeros((64, 64), dtype=np.uint8)
+    labels[8:16, 32:48] = 3
+    write_labels(labels=labels, group=root, name="lbl", axes="yx")
+
+    cache_dir = tmp_path / "cache"
+    with options(label_index=True, label_index_level=1, cache_dir=str(cache_dir)):
+        layers = napari_get_reader(str(path))()
+    label = next(layer for layer in layers if layer[2] == "labels")
+    index = label[1]["metadata"]["label_index"]
+    # computed from level 1, in full resolution coordinates
+    bbox_min, bbox_max = index.bbox(3)
+    assert bbox_min.tolist() == [8, 32]
+    assert bbox_max.tolist() == [16, 48]
+    assert index.count(3) == 4 * 8
+    # the index is cached, for the labels however they're read
+    with options(label_index=True, label_index_level=1, cache_dir=str(cache_dir)):
+        with options(max_requests_per_host=4):
+            napari_get_reader(str(path))()
+        Label(zarr.open_group(path / "labels" / "lbl", mode="r")).label_index()
+    assert len(list(cache_dir.glob("label-index/*.npz"))) == 1
+
+
+def test_narrow_labels(tmp_path: Path):
+    path = tmp_path / "narrow.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    write_image(image=np.zeros((64, 64), dtype=np.uint8), group=root, axes="yx")
+    labels = np.zeros((64, 64), dtype=np.int64)
+    labels[:32] = 1000
+    write_labels(labels=labels, group=root, name="small", axes="yx")
+    # only label 1 is listed in the colors, and a one-pixel label with a large
+    # value is lost in the coarser levels
+    large_labels = labels.copy()
+    large_labels[1, 1] = 70_000
+    write_labels(
+        labels=large_labels,
+        group=root,
+        name="large",
+        axes="yx",
+        label_metadata={"colors": [{"label-value": 1, "rgba": [255, 0, 0, 255]}]},
+    )
+
+    def read_labels():
+        layers = napari_get_reader(str(path))()
+        return [layer[0] for layer in layers if layer[2] == "labels"]
+
+    with options(narrow_labels=True):
+        small, large = read_labels()
+    assert [level.dtype for level in small] == [np.uint16] * len(small)
+    np.testing.assert_array_equal(small[0], labels)
+    # narrowed for the values in the colors and the coarsest level...
+    assert [level.dtype for level in large] == [np.uint16] * len(large)
+    np.testing.assert_array_equal(large[-1], large_labels[::16, ::16])
+    # ...but the chunk with the larger value keeps its dtype
+    full = large[0].compute()
+    assert full.dtype == np.int64
+    np.testing.assert_array_equal(full, large_labels)
+
+    assert read_labels()[0][0].dtype == np.int64
+
+
+def test_narrow_labels_fallback():
+    labels = np.zeros((8, 8), dtype=np.int64)
+    labels[1, 1] = 5
+    labels[6, 6] = 70_000
+    [level] = narrow_labels([da.from_array(labels, chunks=4)], np.array([5]))
+    assert level.dtype == np.uint16
+    # arrays that include the chunk with the larger value have its dtype,
+    # whichever chunk comes first
+    for region in [np.s_[:], np.s_[2:, 2:], np.s_[5:, 5:], np.s_[::2, ::2]]:
+        data = np.asarray(level[region])
+        assert data.dtype == np.int64
+        np.testing.assert_array_equal(data, labels[region])
+    assert level[:4, :4].compute().dtype == np.uint16
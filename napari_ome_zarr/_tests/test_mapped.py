@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+import zarr
+from zarr.codecs import ZstdCodec
+
+from napari_ome_zarr import mapped, tracing
+from napari_ome_zarr.arrays import from_zarr
+from napari_ome_zarr.config import options
+from napari_ome_zarr.store import open_group
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 1000, size=(20, 50, 45)).astype(np.uint16)
+    # a chunk of fill values, that isn't written
+    data[:4, :16, :16] = 0
+    return data
+
+
+@pytest.mark.parametrize(
+    "zarr_format, kwargs",
+    [
+        (3, {}),
+        (2, {}),
+        (2, {"chunk_key_encoding": {"name": "v2", "separator": "/"}}),
+    ],
+)
+def test_memory_mapped(tmp_path, data, zarr_format, kwargs):
+    group = zarr.open_group(tmp_path / "data.zarr", zarr_format=zarr_format)
+    group.create_array(
+        "0",
+        shape=data.shape,
+        chunks=(4, 16, 16),
+        dtype=data.dtype,
+        compressors=None,
+        **kwargs,
+    )[:] = data
+    # in a wrapped store (e.g. tracing, or a request limit)
+    with tracing.profile():
+        array = open_group(tmp_path / "data.zarr")["0"]
+
+    dask_data = mapped.from_zarr(array)
+    assert dask_data is not None
+    np.testing.assert_array_equal(dask_data, data)
+    for key in [
+        np.s_[5],
+        np.s_[3:9, 7:40, ::-3],
+        np.s_[19, 20:3:-2, 44],
+        np.s_[:, 16:32, 16:32],
+    ]:
+        np.testing.assert_array_equal(dask_data[key], data[key])
+
+    # a plane within a chunk is a view of the mapped file
+    plane = mapped.MappedArray(array, tmp_path / "data.zarr" / "0")[5, 16:32, 16:32]
+    np.testing.assert_array_equal(plane, data[5, 16:32, 16:32])
+    assert not plane.flags.owndata and not plane.flags.writeable
+
+
+def test_not_memory_mapped(tmp_path, monkeypatch, data):
+    array = zarr.create_array(
+        tmp_path / "data.zarr",
+        shape=data.shape,
+        chunks=(4, 16, 16),
+        dtype=data.dtype,
+        compressors=ZstdCodec(),
+    )
+    array[:] = data
+    assert mapped.from_zarr(array) is None
+
+    array = zarr.create_array(
+        tmp_path / "uncompressed.zarr",
+        shape=data.shape,
+        chunks=(4, 16, 16),
+        dtype=data.dtype,
+        compressors=None,
+    )
+    assert mapped.from_zarr(array) is not None
+    monkeypatch.setattr(mapped, "from_zarr", lambda array: pytest.fail())
+    with options(memory_map=False):
+        from_zarr(array)
@@ -0,0 +1,59 @@
+import numpy as np
+from napari.components import ViewerModel
+
+from napari_ome_zarr._reader import napari_get_reader
+from napari_ome_zarr.config import options
+from napari_ome_zarr.progressive import ProgressiveRead, apply_update
+from napari_ome_zarr.store import open_group
+
+
+def add_layers(viewer, layers):
+    for data, metadata, layer_type in layers:
+        getattr(viewer, f"add_{layer_type}")(data, **metadata)
+
+
+def test_first_layers(image_path):
+    full = napari_get_reader(str(image_path))()
+    read = ProgressiveRead(open_group(image_path))
+    [(data, metadata, layer_type)] = read.first_layers()
+
+    full_data, full_metadata, _ = full[0]
+    assert layer_type == "image"
+    assert len(data) == 1
+    assert data[0].shape == full_data[-1].shape
+    # the coarse layer covers the same extent as the full resolution
+    np.testing.assert_allclose(
+        np.multiply(data[0].shape[1:], metadata["scale"]),
+        np.multiply(full_data[0].shape[1:], full_metadata["scale"]),
+    )
+
+
+def test_updates(image_path):
+    full = napari_get_reader(str(image_path))()
+    read = ProgressiveRead(open_group(image_path))
+    viewer = ViewerModel()
+    add_layers(viewer, read.first_layers())
+    coarse_names = [layer.name for layer in viewer.layers]
+    assert not any(layer.multiscale for layer in viewer.layers)
+
+    for update in read.updates():
+        apply_update(viewer, update)
+
+    expected = ViewerModel()
+    add_layers(expected, full)
+    assert [layer.name for layer in viewer.layers] == [
+        layer.name for layer in expected.layers
+    ]
+    # the full pyramid replaced the coarse layers, in the same place
+    assert [layer.name for layer in viewer.layers][: len(coarse_names)] == coarse_names
+    assert all(layer.multiscale for layer in viewer.layers)
+    for layer, expected_layer in zip(viewer.layers, expected.layers):
+        np.testing.assert_allclose(layer.scale, expected_layer.scale)
+
+
+def test_progressive_without_viewer(image_path):
+    # nothing to add layers to later: everything is read at once
+    with options(progressive=True):
+        layers = napari_get_reader(str(image_path))()
+    assert [layer_type for _, _, layer_type in layers] == ["image", "labels"]
+    assert all(len(data) > 1 for data, _, _ in layers)
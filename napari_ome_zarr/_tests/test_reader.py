@@ -1,4 +1,7 @@
+import json
+import logging
 import math
+import threading
 from pathlib import Path
 
 import numpy as np
@@ -13,8 +16,17 @@ from ome_zarr.writer import (
     write_well_metadata,
 )
 
+from napari_ome_zarr import _reader
+from napari_ome_zarr import plate as plate_module
+from napari_ome_zarr import tracing, well_stats
 from napari_ome_zarr._reader import napari_get_reader
-from napari_ome_zarr.ome_zarr_reader import _match_colors_to_available_colormap
+from napari_ome_zarr.config import options
+from napari_ome_zarr.ome_zarr_reader import (
+    Plate,
+    _match_colors_to_available_colormap,
+)
+from napari_ome_zarr.plate import PlateLayout
+from napari_ome_zarr.tracing import profile
 
 
 class TestNapari:
@@ -67,6 +79,30 @@ class TestNapari:
         assert reader is not None
         assert callable(reader)
 
+    def test_get_reader_with_several_paths(self, tmp_path):
+        paths = [str(self.path_3d), str(self.path_2d)]
+        layers = napari_get_reader(paths)()
+        # the layers of each dataset, in the order of the paths
+        assert [layer[2] for layer in layers] == ["image", "labels"] * 2
+        assert layers[0][1]["name"] == ["Red", "Green", "Blue"]
+        assert layers[2][1]["name"] == "channel_0"
+
+        with pytest.warns(UserWarning, match="Failed to open"):
+            reader = napari_get_reader([str(tmp_path / "missing"), str(self.path_2d)])
+        assert len(reader()) == 2
+
+    def test_tracing(self, caplog, capsys):
+        with caplog.at_level(logging.DEBUG, logger="napari_ome_zarr"):
+            napari_get_reader(str(self.path_3d))()
+        # nothing is printed...
+        assert capsys.readouterr().out == ""
+        # ...but timings and counts are logged
+        assert any(getattr(r, "phase", None) == "read_ome_zarr" for r in caplog.records)
+        counts = next(r.counts for r in caplog.records if hasattr(r, "counts"))
+        assert counts["groups_opened"] >= 2
+        assert counts["metadata_bytes"] > 0
+        assert counts["dask_arrays_created"] > 0
+
     def test_get_reader_pass(self):
         reader = napari_get_reader("fake.file")
         assert reader is None
@@ -137,6 +173,23 @@ def test_match_colors_to_available_colormap(colors, expected_name):
     assert colormap.name == expected_name
 
 
+def test_match_colors_shares_colormaps(monkeypatch):
+    # equal custom colormaps are shared...
+    cmap = _match_colors_to_available_colormap(Colormap([[0, 0, 0], [0.1, 0.2, 0.3]]))
+    other = _match_colors_to_available_colormap(Colormap([[0, 0, 0], [0.1, 0.2, 0.3]]))
+    assert cmap is other
+    # ...until an equal napari colormap is registered (for this test only)
+    monkeypatch.setitem(
+        AVAILABLE_COLORMAPS,
+        "test_registered",
+        Colormap([[0, 0, 0], [0.1, 0.2, 0.3]], name="test_registered"),
+    )
+    registered = _match_colors_to_available_colormap(
+        Colormap([[0, 0, 0], [0.1, 0.2, 0.3]])
+    )
+    assert registered is AVAILABLE_COLORMAPS["test_registered"]
+
+
 SPATIAL_UNITS = {"z": "micrometer", "y": "micrometer", "x": "micrometer"}
 
 
@@ -249,6 +302,48 @@ class TestPlates:
                 image_group = well_group.require_group(str(field))
                 write_image(image=generate_data(wi, fi), group=image_group, axes="czyx")
 
+    def test_iter_wells(self):
+        plate = Plate(zarr.open_group(self.plate_path, mode="r"))
+        records = list(plate.iter_wells())
+        assert [(r.well, r.field) for r in records] == [
+            (well, field) for well in self.well_paths for field in self.field_paths
+        ]
+        for record in records:
+            well_idx = self.well_paths.index(record.well)
+            field_idx = self.field_paths.index(record.field)
+            assert isinstance(record.data, np.ndarray)
+            assert record.data.shape == (self.sizec, self.sizez, self.sizey, self.sizex)
+            assert np.all(record.data == well_idx * 10 + field_idx * 5)
+
+        records = list(plate.iter_wells(level=1, fields=[1]))
+        assert [r.field for r in records] == ["1"] * len(self.well_paths)
+        image = zarr.open_group(self.plate_path / "A/1/1", mode="r")
+        datasets = image.attrs["ome"]["multiscales"][0]["datasets"]
+        assert records[0].level == datasets[1]["path"]
+        assert records[0].data.shape[-2:] == (self.sizey // 2, self.sizex // 2)
+
+    def test_iter_wells_prefetch(self, monkeypatch):
+        reads = []
+        prefetched = threading.Event()
+        read_well_image = plate_module._read_well_image
+
+        def counting_read(*args):
+            reads.append(args[1:3])
+            if len(reads) >= 3:
+                prefetched.set()
+            return read_well_image(*args)
+
+        monkeypatch.setattr(plate_module, "_read_well_image", counting_read)
+        wells = Plate(zarr.open_group(self.plate_path, mode="r")).iter_wells(prefetch=2)
+        first = next(wells)
+        assert (first.well, first.field) == ("A/1", "0")
+        # the first image and the two prefetched are read...
+        assert prefetched.wait(timeout=10)
+        # ...and no more are read until they're consumed
+        assert len(reads) == 3
+        assert len(list(wells)) == len(self.well_paths) * len(self.field_paths) - 1
+        assert len(reads) == len(self.well_paths) * len(self.field_paths)
+
     def test_read_plate(self):
         layers = napari_get_reader(str(self.plate_path))()
         assert len(layers) == 1
@@ -305,3 +400,274 @@ class TestPlates:
 
             tilex = math.ceil(tilex / 2)
             tiley = math.ceil(tiley / 2)
+
+
+def test_plate_layout():
+    plate_data = {
+        "rows": [{"name": "A"}, {"name": "B"}],
+        "columns": [{"name": "1"}, {"name": "2"}, {"name": "3"}],
+        "wells": [
+            {"path": "B/3", "rowIndex": 1, "columnIndex": 2},
+            {"path": "A/2"},
+            {"path": "C/1"},
+        ],
+    }
+    layout = PlateLayout(plate_data)
+    assert layout.well_path(1, 2) == "B/3"
+    # no rowIndex and columnIndex (before v0.4): found from the path
+    assert layout.well_path(0, 1) == "A/2"
+    assert layout.well_path(0, 0) is None
+    assert sum(path is not None for row in layout.grid for path in row) == 2
+
+
+def test_plate_of_different_sizes(tmp_path: Path):
+    path = tmp_path / "plate.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    well_paths = ["A/1", "A/2", "B/2"]
+    write_plate_metadata(root, ["A", "B"], ["1", "2"], well_paths)
+    shapes = {"A/1": (1, 32, 48), "A/2": (1, 64, 32), "B/2": (1, 16, 16)}
+    for index, well_path in enumerate(well_paths):
+        well_group = root.require_group(well_path)
+        write_well_metadata(well_group, ["0"])
+        write_image(
+            image=np.full(shapes[well_path], index + 1, dtype=np.uint8),
+            group=well_group.require_group("0"),
+            axes="cyx",
+        )
+
+    [(data, _, _)] = napari_get_reader(str(path))()
+    plate = data[0].compute()
+    # the cells are the size of the largest image, the others are padded
+    assert plate.shape == (1, 128, 96)
+    np.testing.assert_array_equal(plate[:, :32, :48], 1)
+    np.testing.assert_array_equal(plate[:, 32:64, :48], 0)
+    np.testing.assert_array_equal(plate[:, :64, 48:80], 2)
+    np.testing.assert_array_equal(plate[:, :64, 80:], 0)
+    np.testing.assert_array_equal(plate[:, 64:, :48], 0)
+    np.testing.assert_array_equal(plate[:, 64:80, 48:64], 3)
+    np.testing.assert_array_equal(plate[:, 80:, 48:], 0)
+
+
+def test_plate_labels_share_scan(tmp_path: Path, monkeypatch):
+    path = tmp_path / "plate.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    well_paths = ["A/1", "A/2"]
+    write_plate_metadata(root, ["A"], ["1", "2"], well_paths)
+    for index, well_path in enumerate(well_paths):
+        well_group = root.require_group(well_path)
+        write_well_metadata(well_group, ["0"])
+        image_group = well_group.require_group("0")
+        write_image(
+            image=np.full((1, 64, 64), index, dtype=np.uint8),
+            group=image_group,
+            axes="cyx",
+        )
+        for name in ["cells", "nuclei"]:
+            write_labels(
+                np.full((64, 64), index + 1, dtype=np.uint32),
+                image_group,
+                name=name,
+                axes="yx",
+            )
+
+    layouts = []
+    from_group = PlateLayout.from_group
+
+    def counting_from_group(plate_group):
+        layouts.append(plate_group.path)
+        return from_group(plate_group)
+
+    monkeypatch.setattr(PlateLayout, "from_group", counting_from_group)
+    cache_dir = tmp_path / "cache"
+    with options(label_index=True, cache_dir=str(cache_dir)), profile() as report:
+        layers = napari_get_reader(str(path))()
+    assert [layer_type for _, _, layer_type in layers] == ["image", "labels", "labels"]
+    # label indexes are only computed for label images, not for plates
+    assert "label_index" not in layers[1][1].get("metadata", {})
+    assert not list(cache_dir.glob("label-index/*.npz"))
+    np.testing.assert_array_equal(layers[1][0][0][:, 64:], 2)
+    levels = len(layers[0][0])
+    # each array is opened once, in one pass per level for images and labels
+    assert report.phases["PlateScan.open_level"]["calls"] == levels
+    assert report.counts["arrays_opened"] == len(well_paths) * 3 * levels
+    # the plate's layout is indexed once, for the plate and its labels
+    assert len(layouts) == 1
+
+
+def test_plate_acquisitions(tmp_path: Path):
+    path = tmp_path / "plate.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    well_paths = ["A/1", "A/2"]
+    write_plate_metadata(
+        root, ["A"], ["1", "2"], well_paths, acquisitions=[{"id": 1}, {"id": 2}]
+    )
+    for index, well_path in enumerate(well_paths):
+        well_group = root.require_group(well_path)
+        # the second well was only imaged in the first acquisition
+        acquisitions = [1, 2] if index == 0 else [1]
+        write_well_metadata(
+            well_group,
+            [{"path": str(a), "acquisition": a} for a in acquisitions],
+        )
+        for acquisition in acquisitions:
+            write_image(
+                image=np.full((1, 16, 16), index * 10 + acquisition, dtype=np.uint8),
+                group=well_group.require_group(str(acquisition)),
+                axes="cyx",
+            )
+
+    with options(acquisition=2):
+        [(data, metadata, _)] = napari_get_reader(str(path))()
+    assert metadata["metadata"] == {"acquisition": 2}
+    np.testing.assert_array_equal(data[0][:, :, :16], 2)
+    np.testing.assert_array_equal(data[0][:, :, 16:], 0)
+
+    plate = Plate(zarr.open_group(path, mode="r"))
+    assert [a["id"] for a in plate.acquisitions()] == [1, 2]
+    plate.acquisition = 1
+    np.testing.assert_array_equal(plate.data()[0][:, :, 16:], 11)
+    # only the fields of the acquisition
+    assert [(r.well, r.field) for r in plate.iter_wells()] == [
+        ("A/1", "1"),
+        ("A/2", "1"),
+    ]
+    plate.acquisition = 3
+    with pytest.raises(ValueError, match="not one of"):
+        plate.data()
+
+
+def test_plate_well_stats(tmp_path: Path, monkeypatch):
+    path = tmp_path / "plate.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    well_paths = ["A/1", "A/2", "B/1"]
+    write_plate_metadata(root, ["A", "B"], ["1", "2"], well_paths)
+
+    def write_well(index: int, well_path: str, dtype: type = np.uint8) -> None:
+        well_group = root.require_group(well_path)
+        write_well_metadata(well_group, ["0"])
+        # the last well is wider than the first
+        data = np.zeros((2, 16, 16 if index < 2 else 24), dtype=dtype)
+        data[0] = index
+        data[1] = 50 * (index + 1)
+        image_group = well_group.create_group("0", overwrite=True)
+        write_image(image=data, group=image_group, axes="cyx")
+
+    for index, well_path in enumerate(well_paths):
+        write_well(index, well_path)
+
+    with options(well_stats=True, cache_dir=str(tmp_path / "cache")):
+        image, stats = napari_get_reader(str(path))()
+        data, metadata, layer_type = stats
+        assert layer_type == "image"
+        assert metadata["channel_axis"] == 1
+        # a pixel per cell of the stitched plate
+        assert image[0][0].shape == (2, 32, 48)
+        assert metadata["scale"] == [1.0, 16.0, 24.0]
+        heatmap = data[0].compute()
+        assert heatmap.shape == (len(well_stats.STATISTICS), 2, 2, 2)
+        mean = well_stats.STATISTICS.index("mean")
+        np.testing.assert_array_equal(heatmap[mean, 0], [[0, 1], [2, np.nan]])
+        np.testing.assert_array_equal(heatmap[mean, 1], [[50, 100], [150, np.nan]])
+        table = metadata["metadata"]["well_stats"]
+        assert list(table.columns[:4]) == ["well", "row", "column", "channel"]
+        assert len(table) == 6
+
+        # the statistics are read from the cache the next time
+        def compute(*args):
+            raise AssertionError("not cached")
+
+        monkeypatch.setattr(well_stats, "compute_well_stats", compute)
+        [_, (cached, _, _)] = napari_get_reader(str(path))()
+        np.testing.assert_array_equal(cached[0].compute(), heatmap)
+        # whichever wrappers the store is read through
+        with options(max_requests_per_host=4):
+            napari_get_reader(str(path))()
+
+        # but not if the arrays of any well change
+        write_well(2, "B/1", np.uint16)
+        with pytest.raises(AssertionError, match="not cached"):
+            napari_get_reader(str(path))()
+
+
+def test_float16_levels(tmp_path: Path):
+    path = tmp_path / "float.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    data = np.random.default_rng(0).random((2, 64, 64), dtype=np.float32) * 1000
+    write_image(image=data, group=root, axes="cyx")
+    windows = [{"start": 0, "end": 1000}, {"start": 100, "end": 500}]
+    ome = root.attrs["ome"]
+    ome["omero"] = {"channels": [{"color": "FF0000", "window": w} for w in windows]}
+    root.attrs["ome"] = ome
+
+    with options(float16_level=2):
+        [(levels, metadata, _)] = napari_get_reader(str(path))()
+    assert [level.dtype for level in levels] == [np.float32] * 2 + [np.float16] * 3
+    assert metadata["contrast_limits"] == [[0, 1000], [100, 500]]
+    full = zarr.open_array(str(path / "s2"), mode="r")[:]
+    np.testing.assert_allclose(levels[2], full, rtol=1e-3)
+
+    # the contrast limits are too close together for float16's precision
+    ome["omero"]["channels"][1]["window"] = {"start": 990, "end": 1000}
+    root.attrs["ome"] = ome
+    with options(float16_level=2):
+        [(levels, _, _)] = napari_get_reader(str(path))()
+    assert [level.dtype for level in levels] == [np.float32] * 5
+
+
+def test_profile_report(image_path: Path, tmp_path: Path):
+    report_path = tmp_path / "report.json"
+
+    with options(profile=str(report_path)):
+        layers = napari_get_reader(str(image_path))()
+    assert len(layers) == 2
+
+    report = json.loads(report_path.read_text())
+    assert report["seconds"] > 0
+    assert report["phases"]["open_group"]["calls"] >= 1
+    assert report["phases"]["Multiscales.data"]["calls"] == 1
+    assert report["phases"]["Label.metadata"]["calls"] == 1
+    assert report["counts"]["metadata_requests"] > 0
+    assert report["counts"]["metadata_bytes"] > 0
+    assert [layer["type"] for layer in report["layers"]] == ["image", "labels"]
+    assert all(layer["dask_tasks"] > 0 for layer in report["layers"])
+
+
+def test_profile_progressive(image_path: Path, tmp_path: Path, monkeypatch):
+    # the profile reads with the same reader as without one
+    roots = []
+    progressive_reader = _reader.progressive_reader
+
+    def recording_reader(group):
+        roots.append(group.path)
+        return progressive_reader(group)
+
+    monkeypatch.setattr(_reader, "progressive_reader", recording_reader)
+    report_path = tmp_path / "report.json"
+    with options(profile=str(report_path), progressive=True):
+        reader = napari_get_reader(str(image_path))
+        roots.clear()
+        layers = reader()
+    assert roots == [""]
+    assert len(layers) == 2
+    assert json.loads(report_path.read_text())["phases"]["open_group"]["calls"] >= 1
+
+
+def test_profile_plate(tmp_path: Path):
+    path = tmp_path / "plate.zarr"
+    root = zarr.open_group(str(path), mode="w")
+    write_plate_metadata(root, ["A"], ["1", "2"], ["A/1"])
+    well_group = root.require_group("A").require_group("1")
+    write_well_metadata(well_group, ["0"])
+    write_image(
+        image=np.zeros((1, 16, 16), dtype=np.uint8),
+        group=well_group.require_group("0"),
+        axes="cyx",
+    )
+
+    with profile() as report:
+        layers = napari_get_reader(str(path))()
+    assert report.phases["get_first_well"]["calls"] >= 1
+    # one stitched grid per pyramid level
+    assert report.phases["get_stitched_grid"]["calls"] == len(layers[0][0])
+    # no profile: nothing is recorded
+    assert not tracing.enabled()
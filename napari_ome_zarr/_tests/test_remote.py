@@ -0,0 +1,153 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+import zarr
+from ome_zarr.writer import write_image
+
+from napari_ome_zarr._reader import napari_get_reader
+from napari_ome_zarr.config import options
+
+
+def test_read_remote_image(image_path, http_server):
+    server = http_server(image_path.parent)
+    url = f"{server.url}/image.zarr"
+
+    layers = napari_get_reader(url)()
+    local_layers = napari_get_reader(str(image_path))()
+    assert len(layers) == len(local_layers) == 2
+    for (data, metadata, layer_type), local in zip(layers, local_layers):
+        assert layer_type == local[2]
+        assert metadata["name"] == local[1]["name"]
+        assert [d.shape for d in data] == [d.shape for d in local[0]]
+
+    # opening is lazy: no chunks are read until the data is accessed
+    assert all(
+        path.rsplit("/", 1)[-1] in ("zarr.json", ".zattrs", ".zgroup", ".zmetadata")
+        for _, path in server.requests
+    )
+    server.reset_counts()
+    np.testing.assert_array_equal(layers[0][0][-1], local_layers[0][0][-1])
+    assert server.request_count > 0
+
+
+def test_read_remote_label(image_path, http_server):
+    # labels open their parent image, which must also be found over HTTP
+    server = http_server(image_path.parent)
+    layers = napari_get_reader(f"{server.url}/image.zarr/labels/astronaut")()
+    assert [layer[2] for layer in layers] == ["image", "labels"]
+
+
+def test_latency_and_bandwidth(tmp_path: Path, http_server):
+    root = zarr.open_group(str(tmp_path / "data.zarr"), mode="w")
+    data = np.ones(200_000, dtype=np.uint8)
+    root.create_array("a", data=data, chunks=data.shape, compressors=None)
+
+    server = http_server(tmp_path, latency=0.05, bandwidth=1_000_000)
+    array = zarr.open_array(f"{server.url}/data.zarr/a", mode="r")
+    server.reset_counts()
+    start = time.perf_counter()
+    array[:]
+    # one request for the chunk: latency + 200 kB at 1 MB/s
+    assert time.perf_counter() - start >= 0.25
+    assert server.request_count == 1
+    assert server.bytes_sent > 0
+
+
+def test_byte_range(tmp_path: Path, http_server):
+    (tmp_path / "data.bin").write_bytes(bytes(range(100)))
+    server = http_server(tmp_path)
+    url = f"{server.url}/data.bin"
+    assert requests.get(url, headers={"Range": "bytes=10-13"}).content == bytes(
+        range(10, 14)
+    )
+    assert requests.get(url, headers={"Range": "bytes=-2"}).content == bytes([98, 99])
+
+
+def test_threads_and_max_requests_per_host(tmp_path: Path, http_server):
+    root = zarr.open_group(str(tmp_path / "data.zarr"), mode="w")
+    write_image(
+        image=np.ones((64, 64), dtype=np.uint8),
+        group=root,
+        axes="yx",
+        storage_options={"chunks": (8, 8)},
+    )
+    server = http_server(tmp_path, latency=0.01)
+    url = f"{server.url}/data.zarr"
+
+    for max_requests_per_host in (0, 2):
+        with options(threads=8, max_requests_per_host=max_requests_per_host):
+            data = napari_get_reader(url)()[0][0][0]
+            server.reset_counts()
+            np.asarray(data)
+        assert server.request_count == 64
+        if max_requests_per_host:
+            assert server.max_in_flight <= max_requests_per_host
+        else:
+            assert server.max_in_flight > 2
+
+
+def test_open_several_concurrently(tmp_path: Path, http_server):
+    for index in range(6):
+        root = zarr.open_group(str(tmp_path / f"{index}.zarr"), mode="w")
+        write_image(image=np.ones((16, 16), dtype=np.uint8), group=root, axes="yx")
+    server = http_server(tmp_path, latency=0.05)
+    urls = [f"{server.url}/{index}.zarr" for index in range(6)]
+
+    in_flight = {}
+    for limit in (1, 6):
+        server.reset_counts()
+        with options(max_concurrent_opens=limit):
+            layers = napari_get_reader(urls)()
+        assert len(layers) == 6
+        in_flight[limit] = server.max_in_flight
+    # requests for several datasets were in flight at once
+    assert in_flight[6] > in_flight[1]
+
+
+def test_connections_shared(tmp_path: Path, http_server):
+    for index in range(4):
+        root = zarr.open_group(str(tmp_path / f"{index}.zarr"), mode="w")
+        write_image(
+            image=np.ones((64, 64), dtype=np.uint8),
+            group=root,
+            axes="yx",
+            storage_options={"chunks": (16, 16)},
+        )
+    server = http_server(tmp_path, latency=0.01)
+    urls = [f"{server.url}/{index}.zarr" for index in range(4)]
+
+    with options(connections_per_host=2):
+        layers = napari_get_reader(urls)()
+        for data, _, _ in layers:
+            np.asarray(data[0])
+    # every request (for all datasets) went through the same two connections
+    assert server.request_count > 4 * 16
+    assert server.connections <= 2
+    assert server.max_in_flight <= 2
+
+
+def test_chunk_index(tmp_path: Path, http_server):
+    root = zarr.open_group(str(tmp_path / "data.zarr"), mode="w")
+    data = np.zeros((64, 64), dtype=np.uint8)
+    data[:8, :8] = 1
+    data[40:48, 16:24] = 2
+    # only the 2 chunks that aren't empty are written
+    write_image(image=data, group=root, axes="yx", storage_options={"chunks": (8, 8)})
+    server = http_server(tmp_path)
+    url = f"{server.url}/data.zarr"
+
+    for chunk_index in (False, True):
+        with options(chunk_index=chunk_index):
+            layers = napari_get_reader(url)()
+            server.reset_counts()
+            np.testing.assert_array_equal(layers[0][0][0], data)
+        keys = [f"/data.zarr/s0/c/{i}/{j}" for i in range(8) for j in range(8)]
+        chunk_requests = [path for _, path in server.requests if path in keys]
+        if chunk_index:
+            # the array is listed, and only the chunks that exist are read
+            assert sorted(chunk_requests) == [keys[0], keys[5 * 8 + 2]]
+            assert server.request_count < 16
+        else:
+            assert len(chunk_requests) == 64
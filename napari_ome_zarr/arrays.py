@@ -0,0 +1,105 @@
+"""Creation of the dask arrays returned by the reader."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+import dask
+import dask.array as da
+import numpy as np
+from zarr import Array
+from zarr.core.sync import _get_loop
+
+from . import chunk_index, decode, mapped, tracing
+from .config import get_option
+
+# the largest finite float16
+_FLOAT16_MAX = float(np.finfo(np.float16).max)
+# contrast limits must span this many float16 steps, so that the image doesn't
+# look banded (an 8-bit display shows 256)
+_FLOAT16_STEPS = 256
+
+# the values of the "threads" and "decode_threads" options last applied
+_APPLIED: Dict[str, int] = {"threads": 0, "decode_threads": 0}
+
+
+def _configure_threads() -> None:
+    """
+    Apply the "threads" and "decode_threads" options.
+
+    Dask schedulers and zarr's decoding thread pool are shared by the whole
+    process, so these apply to every array computed with the default (threaded)
+    dask scheduler, not only those created by the reader.
+    """
+    threads = get_option("threads")
+    if threads != _APPLIED["threads"]:
+        dask.config.set(num_workers=threads or None)
+        _APPLIED["threads"] = threads
+
+    decode_threads = get_option("decode_threads")
+    if decode_threads and decode_threads != _APPLIED["decode_threads"]:
+        # zarr decodes chunks in the default executor of its event loop
+        loop = _get_loop()
+        previous = getattr(loop, "_default_executor", None)
+        loop.set_default_executor(
+            ThreadPoolExecutor(decode_threads, thread_name_prefix="napari_ome_zarr")
+        )
+        if previous is not None:
+            # its threads exit once the chunks already submitted are decoded
+            previous.shutdown(wait=False)
+        _APPLIED["decode_threads"] = decode_threads
+
+
+def from_zarr(array: Array) -> da.Array:
+    """Create a (lazy) dask array that reads from a zarr array."""
+    _configure_threads()
+    tracing.count("dask_arrays_created")
+    if get_option("chunk_index"):
+        array = chunk_index.with_index(array)
+    if get_option("memory_map"):
+        data = mapped.from_zarr(array)
+        if data is not None:
+            return data
+    processes = get_option("decode_processes")
+    if processes:
+        data = decode.from_zarr(array, processes)
+        if data is not None:
+            return data
+    return da.from_zarr(array)
+
+
+def fits_float16(dtype: np.dtype, limits: Sequence[Tuple[float, float]]) -> bool:
+    """
+    Whether an image with these contrast limits (for each channel) looks the
+    same when read as float16: the limits are within its range, and far enough
+    apart compared to its precision there. Only types of 4 or more bytes are
+    worth converting.
+    """
+    if dtype.kind not in "iuf" or dtype.itemsize < 4 or not limits:
+        return False
+    for start, end in limits:
+        largest = max(abs(start), abs(end))
+        if largest > _FLOAT16_MAX or end <= start:
+            return False
+        if np.spacing(np.float16(largest)) * _FLOAT16_STEPS > end - start:
+            return False
+    return True
+
+
+def _float16_block(block: np.ndarray) -> np.ndarray:
+    # values out of range are saturated (they're past the contrast limits)
+    return np.clip(block, -_FLOAT16_MAX, _FLOAT16_MAX).astype(np.float16)
+
+
+def to_float16(data: List[da.Array], first: int, start: int = 0) -> List[da.Array]:
+    """
+    Convert the levels of a pyramid from level ``first`` on to float16, chunk
+    by chunk. ``data`` holds the levels from level ``start`` on.
+    """
+    return [
+        (
+            da.map_blocks(_float16_block, level, dtype=np.float16)
+            if index >= first
+            else level
+        )
+        for index, level in enumerate(data, start)
+    ]
@@ -0,0 +1,206 @@
+"""An asyncio entry point to the reader, e.g. for services that read OME-Zarr.
+
+:func:`read_ome_zarr_async` returns the same layers as the napari reader
+without blocking the event loop it's awaited in::
+
+    layers = await read_ome_zarr_async("https://example.com/image.zarr")
+
+It first walks the hierarchy with zarr's async API, requesting the metadata of
+the children of each node (images, labels, the first well of plates, the
+series of bioformats2raw layouts) concurrently, into a MetadataCacheStore. The
+layers are then read from that store as usual, in a worker thread, without
+waiting for a request per node. The napari reader uses it too.
+"""
+
+import asyncio
+import json
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from xml.etree import ElementTree as ET
+
+import zarr.api.asynchronous
+from napari.types import LayerData
+from zarr import Group
+from zarr.abc.store import Store
+from zarr.core.buffer import default_buffer_prototype
+from zarr.core.group import AsyncGroup
+from zarr.core.sync import _get_loop
+from zarr.storage import StorePath
+
+from . import tracing
+from .config import get_option
+from .ome_zarr_reader import read_ome_zarr
+from .snapshot import load_snapshot, save_snapshot
+from .store import MetadataCacheStore, open_store
+
+# metadata documents of a node, for each zarr format
+_NODE_KEYS = {3: ["zarr.json"], 2: [".zgroup", ".zarray", ".zattrs"]}
+
+# the series of a bioformats2raw layout (see Bioformats2raw.children)
+_OME_XML = "OME/METADATA.ome.xml"
+
+# maximum number of nodes whose metadata is requested at once
+_MAX_CONCURRENT_NODES = 32
+
+# threads that read layers from the prefetched metadata
+_EXECUTOR: ThreadPoolExecutor | None = None
+
+
+def _join(path: str, child: str) -> str:
+    return posixpath.normpath(posixpath.join(path, child)) if path else child
+
+
+def _child_paths(attrs: Dict[str, Any]) -> List[str]:
+    """The paths (relative to a node) of the children the reader opens."""
+    paths: List[str] = []
+    for multiscale in attrs.get("multiscales", []):
+        paths.extend(ds["path"] for ds in multiscale.get("datasets", []))
+    if "multiscales" in attrs:
+        paths.append("labels")
+    paths.extend(attrs.get("labels", []))
+    # only the first field of the first well: the others are opened together
+    # by the plate's scan
+    wells = attrs.get("plate", {}).get("wells", [])
+    paths.extend(well["path"] for well in wells[:1])
+    images = attrs.get("well", {}).get("images", [])
+    paths.extend(image["path"] for image in images[:1])
+    for transform in attrs.get("scene", {}).get("coordinateTransformations", []):
+        for io in ("input", "output"):
+            if transform.get(io, {}).get("path") is not None:
+                paths.append(transform[io]["path"])
+    return list(dict.fromkeys(paths))
+
+
+class _Prefetch:
+    """Requests the metadata of the nodes of a hierarchy, into a cache store."""
+
+    def __init__(self, store: MetadataCacheStore, zarr_format: int) -> None:
+        self.store = store
+        self.zarr_format = zarr_format
+        self.semaphore = asyncio.Semaphore(_MAX_CONCURRENT_NODES)
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        buf = await self.store.get(key, default_buffer_prototype())
+        return None if buf is None else buf.to_bytes()
+
+    async def _attrs(self, path: str) -> Dict[str, Any] | None:
+        keys = [_join(path, key) for key in _NODE_KEYS[self.zarr_format]]
+        async with self.semaphore:
+            docs = await asyncio.gather(*(self._get(key) for key in keys))
+        if self.zarr_format == 3:
+            if docs[0] is None:
+                return None
+            attrs = json.loads(docs[0]).get("attributes", {})
+        else:
+            if docs[0] is None:
+                # not a group: an array (or missing)
+                return None
+            attrs = json.loads(docs[2]) if docs[2] is not None else {}
+        return attrs.get("ome", attrs)
+
+    async def _series(self) -> List[str]:
+        # (read from the root of the store, like Bioformats2raw.children)
+        xml = await self._get(_OME_XML)
+        if xml is None:
+            return []
+        return [
+            child.attrib["ID"].replace("Image:", "")
+            for child in ET.fromstring(xml)
+            if child.tag.endswith("Image")
+            and child.attrib.get("ID", "").startswith("Image:")
+        ]
+
+    async def node(self, path: str) -> None:
+        attrs = await self._attrs(path)
+        if attrs is None:
+            return
+        children = _child_paths(attrs)
+        if "bioformats2raw.layout" in attrs and "plate" not in attrs:
+            children.extend(await self._series())
+        await asyncio.gather(*(self.node(_join(path, c)) for c in children))
+
+
+async def _in_zarr_loop(coro: Any) -> Any:
+    # zarr's stores (and their connections) belong to zarr's event loop
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            get_option("max_concurrent_opens"),
+            thread_name_prefix="napari_ome_zarr_read",
+        )
+    return _EXECUTOR
+
+
+async def _read(
+    store: MetadataCacheStore,
+    group: AsyncGroup,
+    counts_before: Dict[str, int] | None = None,
+) -> List[LayerData]:
+    if counts_before is None:
+        counts_before = tracing.counts()
+    loop = asyncio.get_running_loop()
+    root = Group(group)
+    use_snapshot = get_option("metadata_snapshot")
+    cache_dir = get_option("cache_dir")
+
+    documents = None
+    if use_snapshot:
+        documents = await loop.run_in_executor(
+            _executor(), load_snapshot, root, cache_dir
+        )
+    if documents is not None:
+        tracing.count("metadata_snapshots_loaded")
+        store.cache.update(documents)
+    else:
+        with tracing.timed("prefetch_metadata"):
+            await _Prefetch(store, group.metadata.zarr_format).node(
+                group.store_path.path
+            )
+
+    # the reader makes blocking calls to zarr (answered from the cache), so it
+    # can't run in the event loop
+    layers = await loop.run_in_executor(_executor(), read_ome_zarr(root, counts_before))
+    if use_snapshot and documents is None:
+        # with the documents the reader read, besides those prefetched
+        await loop.run_in_executor(
+            _executor(), save_snapshot, root, dict(store.cache), cache_dir
+        )
+    return layers
+
+
+async def read_group_async(group: Group) -> List[LayerData]:
+    """Read the napari layers of an open zarr group (see read_ome_zarr_async)."""
+
+    async def read() -> List[LayerData]:
+        store = MetadataCacheStore(group.store)
+        store_path = StorePath(store, group.path)
+        return await _read(store, AsyncGroup(group.metadata, store_path))
+
+    return await _in_zarr_loop(read())
+
+
+async def read_ome_zarr_async(path: str | Path | Store) -> List[LayerData]:
+    """
+    Read the napari layers (data, metadata, layer type) of the OME-Zarr at a
+    local path or URL, or in a store, without blocking the event loop.
+    """
+
+    async def read() -> List[LayerData]:
+        store = MetadataCacheStore(
+            path if isinstance(path, Store) else open_store(path)
+        )
+        counts_before = tracing.counts()
+        with tracing.timed("open_group"):
+            group = await zarr.api.asynchronous.open_group(store, mode="r")
+        return await _read(store, group, counts_before)
+
+    return await _in_zarr_loop(read())
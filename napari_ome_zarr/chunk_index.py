@@ -0,0 +1,133 @@
+"""Indexes of the chunks that exist in arrays of remote stores.
+
+Sparse arrays (e.g. label images, or images that were only partly acquired)
+have many chunks that were never written, and reading each of them from an
+object store costs a request that only returns "not found". The reader lists
+the keys under each remote array once, the first time a chunk of it is read,
+and reads absent chunks (or shards) as the fill value without a request. The
+indexes are kept for the session.
+
+Enable this with the ``chunk_index`` option. Listing costs a request for
+every thousand or so keys before the first chunk is read, so it's off by
+default: it only saves time for arrays that are mostly empty. Arrays with few
+chunks, or too many to list quickly, are read as usual.
+"""
+
+import asyncio
+import logging
+from typing import Dict, FrozenSet, Iterable, Tuple
+
+from zarr import Array
+from zarr.abc.store import ByteRequest, Store
+from zarr.core.array import AsyncArray
+from zarr.core.buffer import Buffer, BufferPrototype
+from zarr.storage import FsspecStore, StorePath, WrapperStore
+
+from . import tracing
+from .store import _METADATA_KEYS, _is_metadata_key, _unwrap
+
+LOGGER = logging.getLogger(__name__)
+
+# arrays with fewer chunks are read without an index: listing them would cost
+# about as many requests as it could save
+_MIN_CHUNKS = 8
+# listing more keys than this takes longer than it's likely to save
+_MAX_CHUNKS = 10_000
+
+# the keys that exist under each (store, array path), or None if they
+# couldn't be listed
+_INDEXES: Dict[Tuple[str, str], FrozenSet[str] | None] = {}
+
+
+class ChunkIndexStore(WrapperStore):
+    """
+    Store that returns None (the array's fill value) for the chunks of an
+    array that aren't in the list of its keys, without reading them.
+    """
+
+    def __init__(self, store: Store, path: str) -> None:
+        super().__init__(store)
+        self.path = path
+        self.prefix = f"{path}/" if path else ""
+        self._key = (str(_unwrap(store)), path)
+        self._lock: asyncio.Lock | None = None
+
+    def _with_store(self, store: Store) -> "ChunkIndexStore":
+        return type(self)(store, self.path)
+
+    async def _list(self) -> FrozenSet[str] | None:
+        with tracing.timed("list_chunks"):
+            try:
+                keys = frozenset(
+                    [k async for k in self._store.list_prefix(self.prefix)]
+                )
+            except Exception as e:
+                LOGGER.debug("Can't list the chunks of %s: %s", self.path, e)
+                return None
+        # a listing without the array's own metadata isn't to be trusted, e.g.
+        # from an HTTP server that doesn't list directories
+        if not any(f"{self.prefix}{name}" in keys for name in _METADATA_KEYS):
+            LOGGER.debug("Listing of %s doesn't include its metadata", self.path)
+            return None
+        return keys
+
+    async def _index(self) -> FrozenSet[str] | None:
+        if self._key in _INDEXES:
+            return _INDEXES[self._key]
+        # only used from zarr's event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._key not in _INDEXES:
+                _INDEXES[self._key] = await self._list()
+        return _INDEXES[self._key]
+
+    async def _absent(self, key: str) -> bool:
+        if not key.startswith(self.prefix) or _is_metadata_key(key):
+            return False
+        index = await self._index()
+        if index is None or key in index:
+            return False
+        tracing.count("chunk_requests_skipped")
+        return True
+
+    async def get(
+        self,
+        key: str,
+        prototype: BufferPrototype,
+        byte_range: ByteRequest | None = None,
+    ) -> Buffer | None:
+        if await self._absent(key):
+            return None
+        return await self._store.get(key, prototype, byte_range)
+
+    async def get_partial_values(
+        self,
+        prototype: BufferPrototype,
+        key_ranges: Iterable[tuple[str, ByteRequest | None]],
+    ) -> list[Buffer | None]:
+        key_ranges = list(key_ranges)
+        absent = [await self._absent(key) for key, _ in key_ranges]
+        present = [kr for kr, a in zip(key_ranges, absent) if not a]
+        bufs = iter(await self._store.get_partial_values(prototype, present))
+        return [None if a else next(bufs) for a in absent]
+
+    async def exists(self, key: str) -> bool:
+        if await self._absent(key):
+            return False
+        return await self._store.exists(key)
+
+
+def with_index(array: Array) -> Array:
+    """
+    The array, reading through a ChunkIndexStore if it's in a remote store
+    that can be listed and has a number of chunks worth indexing.
+    """
+    store = array.store
+    if not isinstance(_unwrap(store), FsspecStore) or not store.supports_listing:
+        return array
+    if not _MIN_CHUNKS <= array.nchunks <= _MAX_CHUNKS:
+        return array
+    async_array = array._async_array
+    store_path = StorePath(ChunkIndexStore(store, array.path), array.path)
+    return Array(AsyncArray(async_array.metadata, store_path, async_array.config))
@@ -0,0 +1,102 @@
+"""Options for the reader.
+
+Each option can be set with an environment variable ``NAPARI_OME_ZARR_<NAME>``,
+e.g. ``NAPARI_OME_ZARR_LABEL_INDEX=1``, or changed at runtime with
+:func:`set_options` (or temporarily, with the :func:`options` context manager).
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from platformdirs import user_cache_dir
+
+_DEFAULTS: Dict[str, Any] = {
+    # Read labels stored as 32 or 64-bit integers with the smallest dtype
+    # (16 or 32 bits) that the values in their metadata (or coarsest level) fit in
+    "narrow_labels": False,
+    # Compute bounding boxes, centroids and sizes of each label (LabelIndex)
+    "label_index": False,
+    # Pyramid level to compute the label index from (0 is full resolution)
+    "label_index_level": 0,
+    # Directory where computed data (e.g. label indexes) is cached
+    "cache_dir": user_cache_dir("napari-ome-zarr"),
+    # Read the pyramid levels of images from this one on (1 or more) as
+    # float16, if their contrast limits allow it (0: off)
+    "float16_level": 0,
+    # Threads used by dask to compute arrays (0: dask's default, one per CPU)
+    "threads": 0,
+    # Maximum number of requests in flight to each host, e.g. an object store
+    # (0: no limit besides zarr's own per-read concurrency)
+    "max_requests_per_host": 0,
+    # Connections kept open to each host over HTTP, shared by every dataset
+    # read from it (0: no limit)
+    "connections_per_host": 0,
+    # Seconds that idle HTTP connections are kept open, to be reused
+    "keepalive_timeout": 60.0,
+    # List the chunks of remote arrays, to read absent chunks without requests
+    # (for sparse arrays: it delays the first read of dense ones)
+    "chunk_index": False,
+    # Threads used by zarr to decode (decompress) chunks (0: zarr's default)
+    "decode_threads": 0,
+    # Map uncompressed chunks of local arrays into memory instead of reading them
+    "memory_map": True,
+    # Processes to decode (decompress) chunks in, instead of threads (0: off)
+    "decode_processes": 0,
+    # Maximum number of datasets opened at once, when several are opened together
+    "max_concurrent_opens": 8,
+    # Show the coarsest resolution first, and add the rest in the background
+    "progressive": False,
+    # Add a heatmap of intensity statistics of each well to plates
+    "well_stats": False,
+    # Save the metadata read when opening a dataset in cache_dir, and read it
+    # from there when it's opened again (if its root metadata is unchanged)
+    "metadata_snapshot": False,
+    # Id of the acquisition to show the fields of, for plates with several
+    # (None: the first field of each well)
+    "acquisition": None,
+    # Write a JSON profile report (see tracing.profile) of each open to this path
+    "profile": None,
+}
+
+
+def _from_env(name: str, default: Any) -> Any:
+    value = os.environ.get(f"NAPARI_OME_ZARR_{name.upper()}")
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+
+_OPTIONS: Dict[str, Any] = {
+    name: _from_env(name, default) for name, default in _DEFAULTS.items()
+}
+
+
+def get_option(name: str) -> Any:
+    """Return the current value of a reader option."""
+    return _OPTIONS[name]
+
+
+def set_options(**options: Any) -> None:
+    """Set one or more reader options, e.g. ``set_options(label_index=True)``."""
+    for name in options:
+        if name not in _OPTIONS:
+            raise KeyError(f"Unknown option: {name}")
+    _OPTIONS.update(options)
+
+
+@contextmanager
+def options(**options: Any) -> Iterator[None]:
+    """Context manager that sets reader options and restores them on exit."""
+    previous = {name: get_option(name) for name in options}
+    set_options(**options)
+    try:
+        yield
+    finally:
+        _OPTIONS.update(previous)
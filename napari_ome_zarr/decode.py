@@ -0,0 +1,289 @@
+"""Decoding of compressed chunks in a pool of processes.
+
+Some codecs (e.g. zstd at high levels, or blosc with many threads) are CPU
+bound and keep hold of the GIL for part of their work, so decoding them in the
+threads of dask's default scheduler does not use every core. When the
+``decode_processes`` option is set, arrays read by the plugin fetch compressed
+chunks in threads (as zarr does) and decompress them in a process pool. Each
+worker decodes into shared memory, that the returned chunk is a view of, so
+decoded chunks are not pickled back to the reader.
+
+Only arrays whose chunks are stored with ``bytes`` and numcodecs compressors
+(zstd, blosc, gzip for zarr v3; any compressor without filters for zarr v2)
+are decoded this way. Others (e.g. sharded arrays) are read by zarr as usual.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import sys
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Tuple
+
+import dask.array as da
+import numcodecs
+import numpy as np
+from dask.base import tokenize
+from zarr import Array
+from zarr.codecs import BloscCodec, BytesCodec, GzipCodec, ZstdCodec
+from zarr.core.buffer import default_buffer_prototype
+from zarr.core.metadata import ArrayV2Metadata, ArrayV3Metadata
+from zarr.core.sync import sync
+
+LOGGER = logging.getLogger(__name__)
+
+# numcodecs ids of the zarr v3 compressors that can be decoded in a process
+_V3_CODEC_IDS = {BloscCodec: "blosc", GzipCodec: "gzip", ZstdCodec: "zstd"}
+
+_POOL: ProcessPoolExecutor | None = None
+_POOL_SIZE = 0
+# set if worker processes can't be started (or die), to read with zarr instead
+_BROKEN = False
+
+
+class _SharedMemory(SharedMemory):
+    # The mapping is released when the last array viewing it is garbage
+    # collected, instead of by an explicit close() (which fails while it is
+    # viewed).
+    def __del__(self) -> None:
+        pass
+
+
+def _get_pool(processes: int) -> ProcessPoolExecutor:
+    global _POOL, _POOL_SIZE
+    if _POOL is None or _POOL_SIZE != processes:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False)
+        # not fork: the reader runs in a process with other threads (zarr's
+        # event loop, napari's GUI)
+        _POOL = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn")
+        )
+        _POOL_SIZE = processes
+    return _POOL
+
+
+def codec_configs(array: Array) -> List[Dict[str, Any]] | None:
+    """
+    The numcodecs configs of the compressors of an array (in the order they
+    are applied when encoding), or None if its chunks can't be decoded in a
+    process pool.
+    """
+    dtype = np.dtype(array.dtype)
+    if dtype.kind not in "biufc" or dtype.byteorder == ">" or sys.byteorder != "little":
+        return None
+    metadata = array.metadata
+    if isinstance(metadata, ArrayV2Metadata):
+        if metadata.filters or metadata.order != "C":
+            return None
+        if metadata.compressor is None:
+            return []
+        return [metadata.compressor.get_config()]
+    if not isinstance(metadata, ArrayV3Metadata):
+        return None
+    array_bytes, *bytes_bytes = metadata.codecs
+    if not isinstance(array_bytes, BytesCodec) or array_bytes.endian == "big":
+        return None
+    configs = []
+    for codec in bytes_bytes:
+        codec_id = _V3_CODEC_IDS.get(type(codec))
+        if codec_id is None:
+            return None
+        # the encoding settings (e.g. level) aren't needed to decode
+        configs.append({"id": codec_id})
+    return configs
+
+
+def _decode_into(
+    configs: List[Dict[str, Any]], data: bytes, shm_name: str, nbytes: int
+) -> None:
+    """Decode a chunk (in a worker process) into the named shared memory."""
+    # Workers share the reader's resource tracker, so attaching doesn't add
+    # another registration: the reader unlinks the memory
+    shm = SharedMemory(shm_name)
+    try:
+        out = np.ndarray(nbytes, dtype=np.uint8, buffer=shm.buf)
+        decoded: Any = data
+        for config in reversed(configs[1:]):
+            decoded = numcodecs.get_codec(config).decode(decoded)
+        if configs:
+            numcodecs.get_codec(configs[0]).decode(decoded, out=out)
+        else:
+            out[:] = np.frombuffer(decoded, dtype=np.uint8)
+        del out
+    finally:
+        shm.close()
+
+
+class ChunkArray(ABC):
+    """
+    Array-like view of a zarr array, for dask.array.from_array(), that reads
+    whole chunks with _chunks() (implemented by subclasses) instead of zarr.
+    """
+
+    def __init__(self, array: Array) -> None:
+        self.array = array
+        self.shape = array.shape
+        self.dtype = np.dtype(array.dtype)
+        self.ndim = array.ndim
+        self.chunks = array.chunks
+
+    @abstractmethod
+    def _chunks(self, coords: List[Tuple[int, ...]]) -> List[np.ndarray]:
+        """The data of the chunks at the coords of the chunk grid."""
+
+    def _fill(self) -> np.ndarray:
+        return np.full(self.chunks, self.array.fill_value, dtype=self.dtype)
+
+    def _read(self, starts: List[int], stops: List[int]) -> np.ndarray:
+        """Read the (non-empty) region from starts to stops."""
+        first = [start // c for start, c in zip(starts, self.chunks)]
+        last = [(stop - 1) // c for stop, c in zip(stops, self.chunks)]
+        coords = [
+            tuple(f + i for f, i in zip(first, offset))
+            for offset in np.ndindex(*(b - a + 1 for a, b in zip(first, last)))
+        ]
+        chunks = self._chunks(coords)
+
+        def region(origin: Tuple[int, ...]) -> Tuple[Tuple[slice, ...], ...]:
+            # (source, destination) of the overlap of a chunk with the region
+            src, dst = [], []
+            for start, stop, o, size in zip(starts, stops, origin, self.chunks):
+                lo, hi = max(start, o), min(stop, o + size)
+                src.append(slice(lo - o, hi - o))
+                dst.append(slice(lo - start, hi - start))
+            return tuple(src), tuple(dst)
+
+        origins = [tuple(i * c for i, c in zip(co, self.chunks)) for co in coords]
+        if len(coords) == 1:
+            # a view of the chunk, not a copy
+            return chunks[0][region(origins[0])[0]]
+        result = np.empty([b - a for a, b in zip(starts, stops)], dtype=self.dtype)
+        for origin, chunk in zip(origins, chunks):
+            src, dst = region(origin)
+            result[dst] = chunk[src]
+        return result
+
+    def _region(self, key: Any) -> Tuple[List[int], List[int], tuple] | None:
+        """
+        The starts and stops of the region of a (basic) index, and the index
+        of the selection in that region, or None if the selection is empty.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (self.ndim - len(key))
+        starts, stops = [], []
+        steps: List[slice | int] = []
+        for k, size in zip(key, self.shape):
+            if isinstance(k, slice):
+                indices = range(*k.indices(size))
+            else:
+                index = int(k) + size if int(k) < 0 else int(k)
+                indices = range(index, index + 1)
+            if len(indices) == 0:
+                return None
+            lo, hi = min(indices[0], indices[-1]), max(indices[0], indices[-1]) + 1
+            starts.append(lo)
+            stops.append(hi)
+            if isinstance(k, slice):
+                # the slice of the region read, relative to its start
+                end = indices[-1] - lo + (1 if indices.step > 0 else -1)
+                steps.append(
+                    slice(indices[0] - lo, end if end >= 0 else None, indices.step)
+                )
+            else:
+                steps.append(0)
+        return starts, stops, tuple(steps)
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        region = self._region(key)
+        if region is None:
+            return np.asarray(self.array[key])
+        starts, stops, steps = region
+        return self._read(starts, stops)[steps]
+
+
+class ProcessDecodedArray(ChunkArray):
+    """ChunkArray that decodes the chunks it reads in a process pool."""
+
+    def __init__(
+        self, array: Array, configs: List[Dict[str, Any]], processes: int
+    ) -> None:
+        super().__init__(array)
+        self.configs = configs
+        self.processes = processes
+
+    async def _fetch(self, coords: List[Tuple[int, ...]]) -> List[Any]:
+        prototype = default_buffer_prototype()
+        store_path = self.array.store_path
+        keys = [self.array.metadata.encode_chunk_key(c) for c in coords]
+        return await asyncio.gather(
+            *((store_path / key).get(prototype=prototype) for key in keys)
+        )
+
+    def _decode(self, buffers: List[Any]) -> List[np.ndarray]:
+        pool = _get_pool(self.processes)
+        nbytes = int(np.prod(self.chunks)) * self.dtype.itemsize
+        chunks: List[np.ndarray | None] = []
+        pending = []
+        for buf in buffers:
+            if buf is None:
+                chunks.append(None)
+                continue
+            shm = _SharedMemory(create=True, size=nbytes)
+            try:
+                future = pool.submit(
+                    _decode_into, self.configs, buf.to_bytes(), shm.name, nbytes
+                )
+            except BaseException:
+                shm.unlink()
+                raise
+            pending.append((len(chunks), shm, future))
+            chunks.append(None)
+        try:
+            for index, shm, future in pending:
+                future.result()
+                # a view of the shared memory the chunk was decoded into
+                chunks[index] = np.ndarray(
+                    self.chunks, dtype=self.dtype, buffer=shm.buf
+                )
+        finally:
+            # views of the memory stay valid after it is unlinked
+            for _, shm, _ in pending:
+                shm.unlink()
+        return [self._fill() if c is None else c for c in chunks]
+
+    def _chunks(self, coords: List[Tuple[int, ...]]) -> List[np.ndarray]:
+        return self._decode(sync(self._fetch(coords)))
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        global _BROKEN
+        if not _BROKEN:
+            try:
+                return super().__getitem__(key)
+            except (BrokenProcessPool, OSError) as e:
+                LOGGER.warning("Can't decode chunks in processes (%s), using zarr", e)
+                _BROKEN = True
+        return np.asarray(self.array[key])
+
+
+def from_zarr(array: Array, processes: int) -> da.Array | None:
+    """
+    Create a dask array that decodes the chunks of a zarr array in a pool of
+    processes, or return None if the array's codecs aren't supported.
+    """
+    configs = codec_configs(array)
+    if configs is None:
+        LOGGER.debug("Can't decode %s in processes", array.path)
+        return None
+    return da.from_array(
+        ProcessDecodedArray(array, configs, processes),
+        chunks=array.chunks,
+        name=f"from-zarr-{tokenize(str(array.store_path), processes)}",
+        asarray=False,
+        fancy=False,
+        inline_array=True,
+    )
@@ -0,0 +1,427 @@
+"""Export of a region of an image or plate to a local OME-Zarr.
+
+Revisiting a few wells of a remote plate, or a region of a remote whole-slide
+image, reads the same chunks over the network every time. ``export_image()``
+and ``export_plate()`` (or the ``export()`` method of the reader's Multiscales
+and Plate specs) copy a region, a subset of resolution levels and of channels
+to a local OME-Zarr, with metadata adjusted to match (the datasets of the
+exported levels, a translation to the origin of the region, the exported
+channels), so that opening the copy shows the region where it was in the
+original.
+
+Chunks are copied in parallel. The chunks already written are recorded in a
+progress file in each exported image, so that an interrupted export continues
+where it stopped when it is run again with the same parameters (and a complete
+one is not copied again).
+"""
+
+import copy
+import json
+import logging
+import math
+import os
+import shutil
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Sequence, Set, Tuple, cast
+
+import numpy as np
+import zarr
+from zarr import Array, Group
+
+from . import tracing
+from .plate import get_attrs, get_well_paths
+
+LOGGER = logging.getLogger(__name__)
+
+# written in each exported image: the export parameters and the chunks copied
+PROGRESS_FILE = ".napari_ome_zarr_export.json"
+
+# (when the axes aren't in the metadata, before v0.3)
+_AXES_TYPES_5D = ["time", "channel", "space", "space", "space"]
+
+
+def _axis_types(multiscale: Dict[str, Any]) -> List[str]:
+    if "coordinateSystems" in multiscale:
+        axes = multiscale["coordinateSystems"][0]["axes"]
+    else:
+        axes = multiscale.get("axes")
+    if axes is None:
+        return _AXES_TYPES_5D
+    return [
+        (
+            ("channel" if a.lower() == "c" else "space")
+            if isinstance(a, str)
+            else a.get("type", "space")
+        )
+        for a in axes
+    ]
+
+
+def _level_region(
+    region: List[Tuple[int, int]], full_shape: Tuple[int, ...], shape: Tuple[int, ...]
+) -> List[Tuple[int, int]]:
+    """The region (in full resolution pixels) in the pixels of a level."""
+    level_region = []
+    for (start, stop), full, size in zip(region, full_shape, shape):
+        factor = full / size
+        lo = min(math.floor(start / factor), size - 1)
+        hi = max(min(math.ceil(stop / factor), size), lo + 1)
+        level_region.append((lo, hi))
+    return level_region
+
+
+def _translate(transforms: Any, offset: List[float]) -> Any:
+    """Dataset coordinateTransformations, translated by offset (physical units)."""
+    if not any(offset):
+        return transforms
+    if isinstance(transforms, dict):
+        # v0.6: one transform, with input and output coordinate systems
+        transforms = copy.deepcopy(transforms)
+        translation = {"type": "translation", "translation": offset}
+        if transforms["type"] == "sequence":
+            transforms["transformations"].append(translation)
+            return transforms
+        io = {k: transforms.pop(k) for k in ("input", "output") if k in transforms}
+        return {"type": "sequence", "transformations": [transforms, translation], **io}
+    transforms = copy.deepcopy(transforms)
+    for transform in transforms:
+        if transform["type"] == "translation":
+            transform["translation"] = [
+                t + o for t, o in zip(transform["translation"], offset)
+            ]
+            return transforms
+    return transforms + [{"type": "translation", "translation": offset}]
+
+
+def _dataset_transforms(dataset: Dict[str, Any]) -> List[Dict[str, Any]]:
+    transforms = dataset.get("coordinateTransformations", [])
+    if isinstance(transforms, dict):
+        if transforms["type"] == "sequence":
+            return transforms["transformations"]
+        return [transforms]
+    return transforms
+
+
+def _export_params(
+    source: Group,
+    region: List[Tuple[int, int]],
+    levels: List[int],
+    channels: List[int] | None,
+) -> Dict[str, Any]:
+    return {
+        "source": str(source.store_path),
+        "region": [list(r) for r in region],
+        "levels": levels,
+        "channels": channels,
+    }
+
+
+class _Progress:
+    """The chunks of each array of an image already exported."""
+
+    def __init__(self, image_path: Path, params: Dict[str, Any]) -> None:
+        self.path = image_path / PROGRESS_FILE
+        self.params = params
+        self.done: Dict[str, Set[int]] = {}
+        self.complete = False
+        if self.path.exists():
+            saved = json.loads(self.path.read_text())
+            if saved["params"] != params:
+                raise ValueError(
+                    f"{image_path} is an export with other parameters: "
+                    "use overwrite=True to export it again"
+                )
+            self.done = {k: set(v) for k, v in saved["done"].items()}
+            self.complete = saved["complete"]
+
+    def save(self) -> None:
+        data = {
+            "params": self.params,
+            "complete": self.complete,
+            "done": {k: sorted(v) for k, v in self.done.items()},
+        }
+        # replaced in one step, so that an interruption doesn't leave half a file
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, self.path)
+
+
+def _create_array(group: Group, path: str, source: Array, shape: List[int]) -> Array:
+    chunks = tuple(min(c, s) for c, s in zip(source.chunks, shape))
+    kwargs: Dict[str, Any] = {}
+    if source.metadata.zarr_format == 3:
+        kwargs["dimension_names"] = source.metadata.dimension_names
+        kwargs["serializer"] = source.serializer
+        if source.shards is not None:
+            # whole shards: the same shard is never written by two threads.
+            # Shards must hold a whole number of chunks, so a region smaller
+            # than a shard gets the smallest shard of whole chunks it fits in
+            chunks = source.chunks
+            kwargs["shards"] = tuple(
+                math.ceil(min(sh, s) / c) * c
+                for sh, s, c in zip(source.shards, shape, chunks)
+            )
+    else:
+        kwargs["order"] = source.order
+    return group.create_array(
+        path,
+        shape=shape,
+        chunks=chunks,
+        dtype=source.dtype,
+        fill_value=source.fill_value,
+        compressors=source.compressors,
+        filters=source.filters,
+        overwrite=True,
+        **kwargs,
+    )
+
+
+def _copy_block(
+    source: Array,
+    target: Array,
+    block: Tuple[int, ...],
+    region: List[Tuple[int, int]],
+    channel_axis: int | None,
+    channels: List[int] | None,
+) -> None:
+    write_chunks = target.shards or target.chunks
+    target_sel = []
+    source_sel: List[Any] = []
+    for axis, (index, size, (start, _)) in enumerate(zip(block, write_chunks, region)):
+        lo, hi = index * size, min((index + 1) * size, target.shape[axis])
+        target_sel.append(slice(lo, hi))
+        if axis == channel_axis and channels is not None:
+            source_sel.append(channels[lo:hi])
+        else:
+            source_sel.append(slice(start + lo, start + hi))
+    if channels is not None:
+        data = source.oindex[tuple(source_sel)]
+    else:
+        data = source[tuple(source_sel)]
+    target[tuple(target_sel)] = data
+    tracing.count("export_chunks_written")
+
+
+def _copy_array(
+    source: Array,
+    target: Array,
+    region: List[Tuple[int, int]],
+    channel_axis: int | None,
+    channels: List[int] | None,
+    done: Set[int],
+    progress: _Progress,
+    threads: int,
+) -> None:
+    write_chunks = target.shards or target.chunks
+    grid = tuple(math.ceil(s / c) for s, c in zip(target.shape, write_chunks))
+    pending: Deque[Tuple[int, Future]] = deque()
+
+    def finish_one() -> None:
+        index, future = pending.popleft()
+        future.result()
+        done.add(index)
+        if len(done) % 64 == 0:
+            progress.save()
+
+    with ThreadPoolExecutor(max(1, threads)) as executor:
+        try:
+            for index, block in enumerate(np.ndindex(*grid)):
+                if index in done:
+                    continue
+                future = executor.submit(
+                    _copy_block, source, target, block, region, channel_axis, channels
+                )
+                pending.append((index, future))
+                # only read a few chunks ahead of those being written
+                if len(pending) > 2 * threads:
+                    finish_one()
+            while pending:
+                finish_one()
+        finally:
+            for _, future in pending:
+                future.cancel()
+            progress.save()
+
+
+def export_image(
+    image_group: Group,
+    dest: str | Path,
+    region: Sequence[slice] | None = None,
+    levels: Sequence[int] | None = None,
+    channels: Sequence[int] | None = None,
+    threads: int = 8,
+    overwrite: bool = False,
+) -> Group:
+    """
+    Copy a region of a multiscales image to a local OME-Zarr image at dest (a
+    directory), and return its group.
+
+    ``region`` is a slice per axis (missing trailing axes are exported whole)
+    in full resolution pixels, scaled to the pixels of each level. ``levels``
+    are the indexes of the resolution levels to export (0 is the full
+    resolution; all by default) and ``channels`` the indexes of the channels
+    (instead of the region's slice of the channel axis). Chunks are copied in
+    ``threads`` threads. Running an interrupted export again with the same
+    parameters copies only the chunks that are missing, and a complete one
+    returns the exported group; ``overwrite`` deletes dest and exports again.
+
+    Labels of the image are not exported.
+    """
+    attrs = dict(image_group.attrs)
+    ome_attrs = copy.deepcopy(dict(get_attrs(image_group)))
+    multiscale = ome_attrs["multiscales"][0]
+    datasets = multiscale["datasets"]
+    levels = list(range(len(datasets))) if levels is None else list(levels)
+    full_shape = cast(Array, image_group[datasets[0]["path"]]).shape
+    slices = list(region or [])
+    slices += [slice(None)] * (len(full_shape) - len(slices))
+    full_region = [sl.indices(size)[:2] for sl, size in zip(slices, full_shape)]
+
+    types = _axis_types(multiscale)
+    channel_axis = types.index("channel") if "channel" in types else None
+    channels = list(channels) if channels is not None else None
+    if channels is not None:
+        if channel_axis is None:
+            raise ValueError(f"{image_group.path} has no channel axis")
+        full_region[channel_axis] = (0, full_shape[channel_axis])
+
+    image_path = Path(dest)
+    if overwrite and image_path.exists():
+        shutil.rmtree(image_path)
+    target_group = zarr.open_group(
+        image_path, mode="a", zarr_format=image_group.metadata.zarr_format
+    )
+    params = _export_params(image_group, full_region, levels, channels)
+    progress = _Progress(image_path, params)
+    if progress.complete:
+        LOGGER.info("%s is already exported", image_path)
+        return target_group
+    if "multiscales" in get_attrs(target_group) and not progress.path.exists():
+        raise ValueError(f"{image_path} contains another image")
+
+    with tracing.timed("export_image"):
+        # the metadata first, and chunks into the arrays it describes
+        exported = []
+        arrays = []
+        for level in levels:
+            dataset = datasets[level]
+            source = cast(Array, image_group[dataset["path"]])
+            level_region = _level_region(full_region, full_shape, source.shape)
+            shape = [hi - lo for lo, hi in level_region]
+            if channels is not None:
+                shape[channel_axis] = len(channels)  # type: ignore[index]
+            scale = [1.0] * len(shape)
+            for transform in _dataset_transforms(dataset):
+                if transform["type"] == "scale":
+                    scale = transform["scale"]
+            offset = [lo * s for (lo, _), s in zip(level_region, scale)]
+            if channel_axis is not None:
+                offset[channel_axis] = 0
+            if "coordinateTransformations" in dataset:
+                dataset = {
+                    **dataset,
+                    "coordinateTransformations": _translate(
+                        dataset["coordinateTransformations"], offset
+                    ),
+                }
+            exported.append(dataset)
+            if dataset["path"] in target_group:
+                target = cast(Array, target_group[dataset["path"]])
+            else:
+                target = _create_array(target_group, dataset["path"], source, shape)
+            arrays.append((source, target, level_region))
+        multiscale["datasets"] = exported
+        if channels is not None and "omero" in ome_attrs:
+            omero_channels = ome_attrs["omero"]["channels"]
+            ome_attrs["omero"]["channels"] = [omero_channels[c] for c in channels]
+        if "ome" in attrs:
+            attrs["ome"] = ome_attrs
+        else:
+            attrs = ome_attrs
+        target_group.attrs.put(attrs)
+        progress.save()
+
+        for source, target, level_region in arrays:
+            done = progress.done.setdefault(target.path, set())
+            _copy_array(
+                source,
+                target,
+                level_region,
+                channel_axis,
+                channels,
+                done,
+                progress,
+                threads,
+            )
+    progress.complete = True
+    progress.save()
+    return target_group
+
+
+def export_plate(
+    plate_group: Group,
+    dest: str | Path,
+    wells: Sequence[str] | None = None,
+    fields: Sequence[int] | None = None,
+    region: Sequence[slice] | None = None,
+    levels: Sequence[int] | None = None,
+    channels: Sequence[int] | None = None,
+    threads: int = 8,
+    overwrite: bool = False,
+) -> Group:
+    """
+    Copy wells of a plate to a local OME-Zarr plate at dest, and return its
+    group.
+
+    ``wells`` are the paths of the wells to export (e.g. ``["A/1", "B/3"]``;
+    all by default) and ``fields`` the indexes of the fields of each well. The
+    other arguments apply to each image, as in export_image(). The plate
+    keeps all its rows and columns, so the exported wells stay in place.
+    """
+    if overwrite and Path(dest).exists():
+        shutil.rmtree(dest)
+    zarr_format = plate_group.metadata.zarr_format
+    target_plate = zarr.open_group(dest, mode="a", zarr_format=zarr_format)
+    attrs = dict(plate_group.attrs)
+    ome_attrs = copy.deepcopy(dict(get_attrs(plate_group)))
+    well_paths = get_well_paths(plate_group)
+    if wells is not None:
+        unknown = set(wells) - set(well_paths)
+        if unknown:
+            raise ValueError(f"Wells not in the plate: {sorted(unknown)}")
+        well_paths = [w for w in well_paths if w in wells]
+    plate = ome_attrs["plate"]
+    plate["wells"] = [w for w in plate["wells"] if w["path"] in well_paths]
+    if fields is not None:
+        plate["field_count"] = len(fields)
+    target_plate.attrs.put({**attrs, "ome": ome_attrs} if "ome" in attrs else ome_attrs)
+
+    with tracing.timed("export_plate"):
+        for well_path in well_paths:
+            well_group = cast(Group, plate_group[well_path])
+            well_attrs = dict(well_group.attrs)
+            well_ome_attrs = copy.deepcopy(dict(get_attrs(well_group)))
+            images = well_ome_attrs["well"]["images"]
+            if fields is not None:
+                images = [images[i] for i in fields if i < len(images)]
+            well_ome_attrs["well"]["images"] = images
+            row, column = well_path.split("/")
+            target_well = target_plate.require_group(row).require_group(column)
+            target_well.attrs.put(
+                {**well_attrs, "ome": well_ome_attrs}
+                if "ome" in well_attrs
+                else well_ome_attrs
+            )
+            for image in images:
+                LOGGER.debug("Exporting %s/%s", well_path, image["path"])
+                export_image(
+                    cast(Group, well_group[image["path"]]),
+                    Path(dest, well_path, image["path"]),
+                    region=region,
+                    levels=levels,
+                    channels=channels,
+                    threads=threads,
+                )
+    return target_plate
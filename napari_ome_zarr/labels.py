@@ -0,0 +1,405 @@
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Dict, List, Tuple, cast
+
+import dask
+import dask.array as da
+import numpy as np
+import pandas as pd
+from napari.utils.colormaps import DirectLabelColormap
+from zarr import Array, Group
+
+from . import tracing
+from .arrays import from_zarr
+from .plate import get_attrs
+from .store import _unwrap
+
+LOGGER = logging.getLogger(__name__)
+
+# Name of the optional group (inside a label image) that holds a columnar
+# properties table: one 1D array per property, plus a "label-value" array.
+PROPERTIES_TABLE = "properties"
+
+
+def _to_column(values: List[Any]) -> Any:
+    """Convert a list of property values into a typed column.
+
+    Booleans, integers and floats become numpy-backed columns. If any values are
+    missing, a pandas masked array is returned so that the missing values are
+    tracked by a mask instead of falling back to Python objects.
+    """
+    count = len(values)
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=count)
+    kinds = {type(v) for v in values}
+    kinds.discard(type(None))
+    has_missing = bool(mask.any())
+
+    if kinds == {bool}:
+        bools = np.fromiter((v is True for v in values), dtype=bool, count=count)
+        return pd.arrays.BooleanArray(bools, mask) if has_missing else bools
+    if kinds == {int}:
+        try:
+            ints = np.fromiter(
+                (0 if v is None else v for v in values), dtype=np.int64, count=count
+            )
+        except OverflowError:
+            return np.array(values, dtype=object)
+        return pd.arrays.IntegerArray(ints, mask) if has_missing else ints
+    if kinds and kinds <= {int, float}:
+        floats = np.fromiter(
+            (0.0 if v is None else v for v in values), dtype=np.float64, count=count
+        )
+        return pd.arrays.FloatingArray(floats, mask) if has_missing else floats
+    if kinds == {str}:
+        return pd.array(values, dtype="string")
+    # mixed types or nested values (lists, dicts) can only be stored as objects
+    return np.array(values, dtype=object)
+
+
+def properties_to_table(props_list: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Build a columnar properties table from ``image-label.properties``.
+
+    Each property key becomes one typed column and the ``label-value`` of each
+    entry becomes the ``index`` column used by napari to match rows to labels.
+    Objects that don't have all the keys get a missing value in those columns.
+    """
+    props_list = [p for p in props_list if isinstance(p.get("label-value"), int)]
+    index = np.fromiter(
+        (p["label-value"] for p in props_list), dtype=np.int64, count=len(props_list)
+    )
+
+    # If a label-value is listed more than once, the last entry wins
+    unique_index, first = np.unique(index, return_index=True)
+    if len(unique_index) < len(index):
+        last = len(index) - 1 - np.unique(index[::-1], return_index=True)[1]
+        rows = last[np.argsort(first)]
+        props_list = [props_list[row] for row in rows]
+        index = index[rows]
+
+    keys = [
+        k for k in dict.fromkeys(chain.from_iterable(props_list)) if k != "label-value"
+    ]
+    columns: Dict[str, Any] = {
+        key: _to_column([p.get(key) for p in props_list]) for key in keys
+    }
+    columns["index"] = index
+    return pd.DataFrame(columns)
+
+
+def read_properties_table(label_group: Group) -> pd.DataFrame | None:
+    """
+    Read the columnar properties table stored alongside a label image.
+
+    The table is a ``properties`` group inside the label image, holding one 1D
+    array per property and a ``label-value`` array with the label of each row.
+    Each column is read in a single request as a typed array. Columns that
+    don't have a value for each label are skipped, with a warning. Returns
+    None if there is no table.
+    """
+    try:
+        table = label_group[PROPERTIES_TABLE]
+    except KeyError:
+        return None
+    if not isinstance(table, Group):
+        return None
+
+    columns: Dict[str, np.ndarray] = {}
+    index: np.ndarray | None = None
+    for name, array in table.arrays():
+        if array.ndim != 1:
+            continue
+        if name == "label-value":
+            index = np.asarray(array[:])
+        else:
+            columns[name] = np.asarray(array[:])
+    if index is None:
+        return None
+    for name in [name for name, c in columns.items() if len(c) != len(index)]:
+        LOGGER.warning(
+            "Property %s has %s values for %s labels, skipping it",
+            name,
+            len(columns.pop(name)),
+            len(index),
+        )
+    columns["index"] = index
+    return pd.DataFrame(columns)
+
+
+def colors_to_arrays(color_list: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse ``image-label.colors`` into an array of label values and an (N, 4)
+    array of RGBA colors in the range 0-1.
+
+    Entries without an integer ``label-value`` or an ``rgba`` of 4 values are
+    skipped.
+    """
+    entries = [
+        (color["label-value"], color["rgba"])
+        for color in color_list
+        if isinstance(color, dict)
+        and isinstance(color.get("label-value"), int)
+        and isinstance(color.get("rgba"), (list, tuple))
+        and len(color["rgba"]) == 4
+    ]
+    values = np.fromiter(
+        (entry[0] for entry in entries), dtype=np.int64, count=len(entries)
+    )
+    rgba = np.array([entry[1] for entry in entries], dtype=np.float32)
+    return values, rgba.reshape((len(entries), 4)) / 255
+
+
+def label_colormap(values: np.ndarray, rgba: np.ndarray) -> DirectLabelColormap:
+    """
+    Create a napari colormap that maps each label value to its RGBA color.
+
+    Labels that are not in ``values`` are transparent.
+    """
+    colormap = DirectLabelColormap(color_dict=defaultdict(lambda: np.zeros(4)))
+    # The colors are already float32 RGBA arrays (what napari's validation of
+    # each color produces) so add them directly, skipping the validation of
+    # every single color.
+    colormap.color_dict.update(zip(values.tolist(), rgba))
+    return colormap
+
+
+class LabelIndex:
+    """
+    Voxel count, bounding box and centroid of every label in a label image,
+    for looking up where a label is without scanning the data.
+
+    Coordinates are in pixels of the full resolution level. Bounding boxes are
+    given as the inclusive min and exclusive max coordinates on each axis.
+    """
+
+    def __init__(
+        self,
+        labels: np.ndarray,
+        counts: np.ndarray,
+        bbox_min: np.ndarray,
+        bbox_max: np.ndarray,
+        centroids: np.ndarray,
+    ) -> None:
+        self.labels = labels
+        self.counts = counts
+        self.bbox_min = bbox_min
+        self.bbox_max = bbox_max
+        self.centroids = centroids
+        self._rows = dict(zip(labels.tolist(), range(len(labels))))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __contains__(self, label: int) -> bool:
+        return label in self._rows
+
+    def count(self, label: int) -> int:
+        return int(self.counts[self._rows[label]])
+
+    def bbox(self, label: int) -> Tuple[np.ndarray, np.ndarray]:
+        row = self._rows[label]
+        return self.bbox_min[row], self.bbox_max[row]
+
+    def centroid(self, label: int) -> np.ndarray:
+        return self.centroids[self._rows[label]]
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            labels=self.labels,
+            counts=self.counts,
+            bbox_min=self.bbox_min,
+            bbox_max=self.bbox_max,
+            centroids=self.centroids,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LabelIndex":
+        with np.load(path) as npz:
+            return cls(
+                npz["labels"],
+                npz["counts"],
+                npz["bbox_min"],
+                npz["bbox_max"],
+                npz["centroids"],
+            )
+
+
+def _block_label_stats(block: np.ndarray, offset: Tuple[int, ...]) -> Tuple:
+    """Count, min, max and sum of coordinates of each label (except 0) in block."""
+    labels, inverse, counts = np.unique(
+        block.ravel(), return_inverse=True, return_counts=True
+    )
+    order = np.argsort(inverse, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    mins = np.empty((len(labels), block.ndim), dtype=np.int64)
+    maxs = np.empty((len(labels), block.ndim), dtype=np.int64)
+    sums = np.empty((len(labels), block.ndim), dtype=np.float64)
+    for axis in range(block.ndim):
+        shape = [1] * block.ndim
+        shape[axis] = block.shape[axis]
+        coords = np.arange(offset[axis], offset[axis] + block.shape[axis])
+        coords = np.broadcast_to(coords.reshape(shape), block.shape).ravel()[order]
+        mins[:, axis] = np.minimum.reduceat(coords, starts)
+        maxs[:, axis] = np.maximum.reduceat(coords, starts)
+        sums[:, axis] = np.add.reduceat(coords, starts, dtype=np.float64)
+    foreground = labels != 0
+    return (
+        labels[foreground],
+        counts[foreground],
+        mins[foreground],
+        maxs[foreground],
+        sums[foreground],
+    )
+
+
+def compute_label_index(data: da.Array, scale: Tuple[float, ...]) -> LabelIndex:
+    """
+    Compute the LabelIndex of a label image, one chunk at a time.
+
+    Chunks are processed in parallel by dask, so the image never has to fit in
+    memory. ``scale`` is the size of a pixel of ``data`` in pixels of the full
+    resolution level, used to convert the coordinates.
+    """
+    offsets = [np.concatenate([[0], np.cumsum(c)[:-1]]) for c in data.chunks]
+    blocks = data.to_delayed()
+    stats = []
+    for block_index in np.ndindex(*data.numblocks):
+        offset = tuple(int(offsets[i][b]) for i, b in enumerate(block_index))
+        stats.append(dask.delayed(_block_label_stats)(blocks[block_index], offset))
+    results = dask.compute(*stats)
+
+    # combine the stats of labels that span several chunks
+    labels, inverse = np.unique(
+        np.concatenate([r[0] for r in results]), return_inverse=True
+    )
+    counts = np.bincount(inverse, weights=np.concatenate([r[1] for r in results]))
+    ndim = data.ndim
+    bbox_min = np.full((len(labels), ndim), np.iinfo(np.int64).max, dtype=np.int64)
+    bbox_max = np.full((len(labels), ndim), np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(bbox_min, inverse, np.concatenate([r[2] for r in results]))
+    np.maximum.at(bbox_max, inverse, np.concatenate([r[3] for r in results]))
+    sums = np.concatenate([r[4] for r in results])
+    centroids = np.stack(
+        [np.bincount(inverse, weights=sums[:, axis]) for axis in range(ndim)], axis=-1
+    ) / counts[:, None].clip(min=1)
+
+    scale_array = np.asarray(scale, dtype=np.float64)
+    return LabelIndex(
+        labels,
+        counts.astype(np.int64),
+        np.floor(bbox_min * scale_array).astype(np.int64),
+        np.ceil((bbox_max + 1) * scale_array).astype(np.int64),
+        (centroids + 0.5) * scale_array - 0.5,
+    )
+
+
+def _label_index_cache_path(array: Array, cache_dir: str) -> str:
+    key = json.dumps(
+        # the URL of the array, however its store is opened (or wrapped)
+        [f"{_unwrap(array.store)}/{array.path}", array.metadata.to_dict()],
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(cache_dir, "label-index", f"{digest}.npz")
+
+
+def get_label_index(label_group: Group, level: int, cache_dir: str) -> LabelIndex:
+    """
+    Return the LabelIndex of a label image, computed from the given pyramid level.
+
+    The index is cached in ``cache_dir``, keyed by the array's URL, path
+    and metadata: it's recomputed if the metadata changes (e.g. the shape),
+    but not if chunks are rewritten in place. Delete the cache to recompute it.
+    """
+    paths = [ds["path"] for ds in get_attrs(label_group)["multiscales"][0]["datasets"]]
+    array = cast(Array, label_group[paths[level]])
+    cache_path = _label_index_cache_path(array, cache_dir)
+    if os.path.exists(cache_path):
+        return LabelIndex.load(cache_path)
+
+    full_shape = cast(Array, label_group[paths[0]]).shape
+    scale = tuple(full / size for full, size in zip(full_shape, array.shape))
+    index = compute_label_index(from_zarr(array), scale)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    index.save(cache_path)
+    return index
+
+
+# dtypes that labels are narrowed to, smallest first: 8 bits leave too little
+# room for labels that aren't in the metadata or the coarsest level
+_NARROW_DTYPES = [np.dtype(t) for t in ("uint16", "int16", "uint32", "int32")]
+
+
+def known_label_values(label_group: Group) -> np.ndarray:
+    """The label values listed in the ``colors`` and ``properties`` of a label."""
+    image_label = get_attrs(label_group).get("image-label", {})
+    values, _ = colors_to_arrays(image_label.get("colors", []))
+    props = [p.get("label-value") for p in image_label.get("properties", [])]
+    return np.concatenate([values, [v for v in props if isinstance(v, int)]])
+
+
+def narrowed_dtype(
+    dtype: np.dtype, values: np.ndarray, coarsest: da.Array
+) -> np.dtype | None:
+    """
+    The smallest integer dtype that the label values fit in, or None if it
+    isn't smaller than ``dtype`` (or the range of values is unknown). The
+    values are the known label values, or (if there are none) those of the
+    coarsest level of the pyramid: the full resolution isn't read.
+    """
+    if dtype.kind not in "iu" or dtype.itemsize <= 2:
+        return None
+    if len(values):
+        low, high = min(values.min(), 0), values.max()
+    elif coarsest.size:
+        low, high = dask.compute(coarsest.min(), coarsest.max())
+    else:
+        return None
+    for narrow in _NARROW_DTYPES:
+        info = np.iinfo(narrow)
+        if info.min <= low and high <= info.max:
+            return narrow if narrow.itemsize < dtype.itemsize else None
+    return None
+
+
+class _WideBlock(np.ndarray):
+    """
+    A block of labels that doesn't fit in the narrowed dtype, kept in its
+    stored dtype. Dask joins the blocks of a result into an array of the first
+    block's dtype, unless a block overrides __array_function__: then it uses
+    np.concatenate, which promotes the narrowed blocks to the stored dtype
+    instead of truncating this one.
+    """
+
+    def __array_function__(self, func: Any, types: Any, args: Any, kwargs: Any) -> Any:
+        return super().__array_function__(func, types, args, kwargs)
+
+
+def _narrow_block(block: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    info = np.iinfo(dtype)
+    if block.size and (block.min() < info.min or block.max() > info.max):
+        # a label that's in neither the metadata nor the coarsest level
+        tracing.count("label_blocks_not_narrowed")
+        return block.view(_WideBlock)
+    return block.astype(dtype)
+
+
+def narrow_labels(data: List[da.Array], values: np.ndarray) -> List[da.Array]:
+    """
+    Narrow the dtype of each level of a label pyramid, chunk by chunk, to the
+    smallest that its values fit in (see narrowed_dtype).
+
+    Chunks with values that turn out not to fit keep their stored dtype, and
+    so do the arrays read from them, so that no value is changed.
+    """
+    with tracing.timed("narrowed_dtype"):
+        dtype = narrowed_dtype(data[0].dtype, values, data[-1])
+    if dtype is None:
+        return data
+    return [da.map_blocks(_narrow_block, level, dtype, dtype=dtype) for level in data]
@@ -0,0 +1,86 @@
+"""Memory-mapped reads of uncompressed chunks in local stores.
+
+Reading a chunk through zarr copies the bytes of its file into a new buffer,
+and then (for uncompressed chunks) into the decoded array. When an array is
+stored without compression in a local directory, the reader instead maps the
+file of each chunk into memory and returns numpy views of it: slicing a plane
+out of a volume (e.g. scrolling through z or t in napari) only reads the pages
+of that plane, and it is only copied once, when dask assembles the array it
+returns.
+
+Disable this with the ``memory_map`` option. Sharded arrays (whose chunks are
+parts of a shard file, found with its index) are read by zarr as usual.
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, List, Tuple
+
+import dask.array as da
+import numpy as np
+from dask.base import tokenize
+from zarr import Array
+from zarr.abc.store import Store
+from zarr.storage import LocalStore, WrapperStore
+
+from .decode import ChunkArray, codec_configs
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _local_root(store: Store) -> Path | None:
+    """The directory of a (possibly wrapped) local store, or None."""
+    while isinstance(store, WrapperStore):
+        store = store._store
+    if isinstance(store, LocalStore):
+        return Path(store.root)
+    return None
+
+
+class MappedArray(ChunkArray):
+    """ChunkArray that maps the (uncompressed) chunk files into memory."""
+
+    def __init__(self, array: Array, directory: Path) -> None:
+        super().__init__(array)
+        self.directory = directory
+        self.nbytes = int(np.prod(self.chunks)) * self.dtype.itemsize
+
+    def _map(self, coords: Tuple[int, ...]) -> np.ndarray:
+        path = self.directory / self.array.metadata.encode_chunk_key(coords)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return self._fill()
+        if size != self.nbytes:
+            raise ValueError(f"{path} has {size} bytes, not {self.nbytes}")
+        mapped = np.memmap(path, dtype=self.dtype, mode="r", shape=self.chunks)
+        # (a plain read-only array, that keeps the mapping open)
+        return mapped.view(np.ndarray)
+
+    def _chunks(self, coords: List[Tuple[int, ...]]) -> List[np.ndarray]:
+        return [self._map(c) for c in coords]
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        try:
+            return super().__getitem__(key)
+        except (OSError, ValueError) as e:
+            LOGGER.debug("Can't map chunks of %s (%s), using zarr", self.array.path, e)
+            return np.asarray(self.array[key])
+
+
+def from_zarr(array: Array) -> da.Array | None:
+    """
+    Create a dask array that maps the chunk files of a zarr array into memory,
+    or return None if it isn't an uncompressed array in a local store.
+    """
+    root = _local_root(array.store)
+    if root is None or codec_configs(array) != []:
+        return None
+    return da.from_array(
+        MappedArray(array, root / array.path),
+        chunks=array.chunks,
+        name=f"from-zarr-{tokenize(str(array.store_path), 'mapped')}",
+        asarray=False,
+        fancy=False,
+        inline_array=True,
+    )
@@ -1,21 +1,47 @@
 # zarr v3
 
+import logging
 import warnings
 from abc import ABC
 from collections import defaultdict
-from typing import Any, Callable, Dict, Iterable, List, Tuple
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple, cast
 from xml.etree import ElementTree as ET
 
 import dask.array as da
 import numpy as np
-import zarr
+import pandas as pd
 from napari.utils.colormaps import AVAILABLE_COLORMAPS, Colormap
 from napari.utils.transforms import Affine
-from zarr import Group
+from zarr import Array, Group
 from zarr.core.buffer import default_buffer_prototype
 from zarr.core.sync import SyncMixin
 
-from .plate import get_first_field_path, get_first_well, get_pyramid_lazy
+from . import tracing
+from .arrays import fits_float16, from_zarr, to_float16
+from .config import get_option
+from .export import export_image, export_plate
+from .labels import (
+    LabelIndex,
+    colors_to_arrays,
+    get_label_index,
+    known_label_values,
+    label_colormap,
+    narrow_labels,
+    properties_to_table,
+    read_properties_table,
+)
+from .plate import (
+    PlateLayout,
+    PlateScan,
+    WellImage,
+    get_pyramid_lazy,
+    iter_wells,
+)
+from .store import open_parent_group
+from .well_stats import STATISTICS, get_well_stats, stats_heatmap
+
+LOGGER = logging.getLogger(__name__)
 
 # StrDict = Dict[str, Any]
 # LayerData = Union[Tuple[Any], Tuple[Any, StrDict], Tuple[Any, StrDict, str]]
@@ -31,21 +57,63 @@ AXES_5D = [
 ]
 
 
+# napari colormaps indexed by _colormap_key(), rebuilt when colormaps are added
+_AVAILABLE_COLORMAPS_INDEX: Dict[Tuple, Colormap] = {}
+_INDEXED_COLORMAP_NAMES: set[str] = set()
+# custom colormaps indexed by _colormap_key(), so that equal ones are shared
+_CUSTOM_COLORMAPS: Dict[Tuple, Colormap] = {}
+# colormaps for omero channel colors, indexed by rgb
+_CHANNEL_COLORMAPS: Dict[Tuple, Colormap] = {}
+
+
+def _colormap_key(cmap: Colormap) -> Tuple:
+    """Hashable key of a Colormap's controls, colors (quantized) and interpolation."""
+    colors = np.round(np.asarray(cmap.colors) * 65535).astype(np.int64)
+    controls = np.round(np.asarray(cmap.controls) * 65535).astype(np.int64)
+    return (
+        colors.shape,
+        colors.tobytes(),
+        controls.tobytes(),
+        str(cmap.interpolation),
+    )
+
+
+def _available_colormaps_index() -> Dict[Tuple, Colormap]:
+    if len(AVAILABLE_COLORMAPS) != len(_INDEXED_COLORMAP_NAMES):
+        # napari colormaps have been added since the index was built
+        _AVAILABLE_COLORMAPS_INDEX.clear()
+        _INDEXED_COLORMAP_NAMES.clear()
+        _CHANNEL_COLORMAPS.clear()
+        # if several napari colormaps are equal, the first one is used
+        for name, available_cmap in AVAILABLE_COLORMAPS.items():
+            _AVAILABLE_COLORMAPS_INDEX.setdefault(
+                _colormap_key(available_cmap), available_cmap
+            )
+            _INDEXED_COLORMAP_NAMES.add(name)
+    return _AVAILABLE_COLORMAPS_INDEX
+
+
 def _match_colors_to_available_colormap(custom_cmap: Colormap) -> Colormap:
     """Helper function to match Colormap to an existing napari Colormap.
     If the colormap matches, return the specific napari Colormap, otherwise return the
-    the original Colormap.
+    the original Colormap (or an equal custom Colormap returned previously).
     """
-    for available_cmap in AVAILABLE_COLORMAPS.values():
-        if (
-            np.array_equal(available_cmap.controls, custom_cmap.controls)
-            and np.array_equal(available_cmap.colors, custom_cmap.colors)
-            and available_cmap.interpolation == custom_cmap.interpolation
-        ):
-            custom_cmap = available_cmap
-            break
+    key = _colormap_key(custom_cmap)
+    available_cmap = _available_colormaps_index().get(key)
+    if available_cmap is not None:
+        return available_cmap
+    return _CUSTOM_COLORMAPS.setdefault(key, custom_cmap)
+
 
-    return custom_cmap
+def _channel_colormap(rgb: List[float]) -> Colormap:
+    """Colormap from black to rgb, shared by all channels with the same color."""
+    _available_colormaps_index()
+    key = tuple(rgb)
+    if key not in _CHANNEL_COLORMAPS:
+        # Try to match colormap to an existing napari colormap
+        cmap = _match_colors_to_available_colormap(Colormap([[0, 0, 0], rgb]))
+        _CHANNEL_COLORMAPS[key] = cmap
+    return _CHANNEL_COLORMAPS[key]
 
 
 def remove_axis_from_transform(transform: Dict[str, Any], axis: int) -> Dict[str, Any]:
@@ -133,6 +201,13 @@ def transforms_to_affine(
     return aff
 
 
+def _dataset_scale(dataset: Dict[str, Any]) -> List[float] | None:
+    for transform in dataset.get("coordinateTransformations", []):
+        if transform["type"] == "scale":
+            return transform["scale"]
+    return None
+
+
 class Spec(ABC):
     def __init__(self, group: Group) -> None:
         self.group = group
@@ -157,6 +232,15 @@ class Spec(ABC):
         for child in self.children():
             yield from child.iter_nodes()
 
+    def coarsest_data(self) -> List[da.core.Array]:
+        # the lowest resolution of data(), ideally without opening the others
+        return self.data()[-1:]
+
+    def coarsest_scale_factors(self) -> List[float]:
+        # size of a pixel of coarsest_data(), relative to the full resolution
+        data = self.data()
+        return [a / b for a, b in zip(data[0].shape, data[-1].shape)]
+
     def iter_data(self) -> Iterable[da.core.Array]:
         for node in self.iter_nodes():
             data = node.data()
@@ -199,7 +283,58 @@ class Multiscales(Spec):
     def data(self) -> list[da.core.Array]:
         attrs = Spec.get_attrs(self.group)
         paths = [ds["path"] for ds in attrs["multiscales"][0]["datasets"]]
-        return [da.from_zarr(self.group[path]) for path in paths]
+        arrays = [cast(Array, self.group[path]) for path in paths]
+        return self._reduce_precision([from_zarr(array) for array in arrays])
+
+    def coarsest_data(self) -> list[da.core.Array]:
+        attrs = Spec.get_attrs(self.group)
+        datasets = attrs["multiscales"][0]["datasets"]
+        data = [from_zarr(cast(Array, self.group[datasets[-1]["path"]]))]
+        return self._reduce_precision(data, len(datasets) - 1)
+
+    def _contrast_limits(self) -> list[tuple[float, float]]:
+        # the omero window of each channel, if they all have one
+        channels = Spec.get_attrs(self.group).get("omero", {}).get("channels", [])
+        windows = [ch.get("window") or {} for ch in channels]
+        if not windows or any(
+            w.get("start") is None or w.get("end") is None for w in windows
+        ):
+            return []
+        return [(w["start"], w["end"]) for w in windows]
+
+    def _reduce_precision(
+        self, data: list[da.core.Array], start: int = 0
+    ) -> list[da.core.Array]:
+        # the coarse levels (only shown zoomed out) as float16, if that doesn't
+        # change how they look with the image's contrast limits
+        first = get_option("float16_level")
+        if not first or not fits_float16(data[0].dtype, self._contrast_limits()):
+            return data
+        return to_float16(data, first, start)
+
+    def coarsest_scale_factors(self) -> List[float]:
+        datasets = Spec.get_attrs(self.group)["multiscales"][0]["datasets"]
+        first, last = _dataset_scale(datasets[0]), _dataset_scale(datasets[-1])
+        if first and last and len(first) == len(last) and all(first):
+            return [b / a for a, b in zip(first, last)]
+        # no scale transforms (before v0.4): compare the shapes
+        first_shape = cast(Array, self.group[datasets[0]["path"]]).shape
+        last_shape = cast(Array, self.group[datasets[-1]["path"]]).shape
+        return [a / b for a, b in zip(first_shape, last_shape)]
+
+    def export(
+        self,
+        dest: str | Path,
+        region: Sequence[slice] | None = None,
+        levels: Sequence[int] | None = None,
+        channels: Sequence[int] | None = None,
+        **kwargs: Any,
+    ) -> Group:
+        """
+        Copy a region, levels and channels of the image to a local OME-Zarr.
+        See export.export_image().
+        """
+        return export_image(self.group, dest, region, levels, channels, **kwargs)
 
     def _splits_channels(self) -> bool:
         """Whether a channel axis is turned into separate napari layers.
@@ -305,10 +440,7 @@ class Multiscales(Spec):
                     if greyscale:
                         rgb = [1, 1, 1]
                     # colormap is range: black -> rgb color
-                    cm = Colormap([[0, 0, 0], rgb])
-                    # Try to match colormap to an existing napari colormap
-                    cm = _match_colors_to_available_colormap(cm)
-                    colormaps.append(cm)
+                    colormaps.append(_channel_colormap(rgb))
                 ch_name = ch.get("label", f"channel_{index}")
                 ch_names.append(img_name and f"{img_name}: {ch_name}" or ch_name)
                 visibles.append(ch.get("active", True))
@@ -347,12 +479,13 @@ class Bioformats2raw(Spec):
 
     def children(self) -> list[Spec]:
         # lookup children from series of OME/METADATA.xml
-        xml_data = SyncMixin()._sync(
-            self.group.store.get(
-                "OME/METADATA.ome.xml", prototype=default_buffer_prototype()
+        with tracing.timed("Bioformats2raw.children"):
+            xml_data = SyncMixin()._sync(
+                self.group.store.get(
+                    "OME/METADATA.ome.xml", prototype=default_buffer_prototype()
+                )
             )
-        )
-        root = ET.fromstring(xml_data.to_bytes())
+            root = ET.fromstring(xml_data.to_bytes())
         rv: list[Spec] = []
         for child in root:
             # {http://www.openmicroscopy.org/Schemas/OME/2016-06}Image
@@ -496,57 +629,160 @@ class Scene(Spec):
 
 
 class Plate(Spec):
+    def __init__(self, group: Group, scan: PlateScan | None = None) -> None:
+        super().__init__(group)
+        # the arrays of the images and labels of the wells, shared with the
+        # other nodes of the plate if given
+        self._scan = scan
+        # where each well is, indexed once for all levels (and nodes)
+        self.layout = scan.layout if scan is not None else PlateLayout.from_group(group)
+        # the acquisition shown (None: the first field of each well). Set it
+        # and call data() again to show another, reading only the metadata
+        # of the wells and the arrays of its fields
+        self.acquisition: int | None = None
+        if scan is not None:
+            self.acquisition = scan.acquisition
+        elif get_option("acquisition") is not None:
+            self.acquisition = int(get_option("acquisition"))
+
     @staticmethod
     def matches(group: Group) -> bool:
         return "plate" in Spec.get_attrs(group)
 
+    def acquisitions(self) -> List[Dict[str, Any]]:
+        """The acquisitions listed in the plate metadata."""
+        return Spec.get_attrs(self.group)["plate"].get("acquisitions", [])
+
+    def scan(self) -> PlateScan:
+        # the arrays of the images and labels of the wells, shared with the
+        # PlateLabels children
+        if self._scan is None or self._scan.acquisition != self.acquisition:
+            self._scan = PlateScan(self.group, self.layout, self.acquisition)
+        return self._scan
+
     def data(self) -> list[da.core.Array]:
         # we want to return a dask pyramid...
-        return get_pyramid_lazy(self.group)
+        return get_pyramid_lazy(self.group, scan=self.scan())
+
+    def coarsest_data(self) -> list[da.core.Array]:
+        return get_pyramid_lazy(self.group, coarsest=True, scan=self.scan())
+
+    def first_image(self) -> Multiscales:
+        # the first field of the first well, that all images are assumed to match
+        return Multiscales(self.scan().image_group)
+
+    def coarsest_scale_factors(self) -> List[float]:
+        return self.first_image().coarsest_scale_factors()
 
     def metadata(self) -> dict:
-        well_group = get_first_well(self.group)
-        first_field_path = get_first_field_path(well_group)
-        image_group = well_group[first_field_path]
-        return Multiscales(image_group).metadata()
+        rsp = self.first_image().metadata()
+        if self.acquisition is not None:
+            rsp["metadata"] = {"acquisition": self.acquisition}
+        return rsp
+
+    def iter_wells(
+        self,
+        level: int = 0,
+        fields: Sequence[int] | None = None,
+        prefetch: int = 4,
+    ) -> Iterator[WellImage]:
+        """
+        Read the image of each field of each well (of the acquisition shown,
+        if set) as a numpy array, in well order, reading up to ``prefetch``
+        images ahead. See plate.iter_wells().
+
+            for well, field, level, data in Plate(group).iter_wells(level=1):
+                ...
+        """
+        return iter_wells(
+            self.group,
+            level,
+            fields,
+            prefetch=prefetch,
+            layout=self.layout,
+            acquisition=self.acquisition,
+        )
+
+    def export(
+        self,
+        dest: str | Path,
+        wells: Sequence[str] | None = None,
+        fields: Sequence[int] | None = None,
+        **kwargs: Any,
+    ) -> Group:
+        """
+        Copy wells (and a region, levels and channels of their images) to a
+        local OME-Zarr plate. See export.export_plate().
+        """
+        return export_plate(self.group, dest, wells, fields, **kwargs)
 
     def children(self) -> list[Spec]:
         # Plate has children If it has labels - check one Well...
-        # Child is PlateLabels
-        well_group = get_first_well(self.group)
-        first_field_path = get_first_field_path(well_group)
-        image_group = well_group[first_field_path]
-        labels_group = image_group.get("labels", None)
-        if labels_group is not None:
-            labels_attrs = Spec.get_attrs(labels_group)
-            if "labels" in labels_attrs:
-                ch: list[Spec] = []
-                for labels_path in labels_attrs["labels"]:
-                    ch.append(PlateLabels(self.group, labels_path=labels_path))
-                return ch
-        return []
+        # Child is PlateLabels, reading the arrays found by the same scan
+        scan = self.scan()
+        ch: list[Spec] = [
+            PlateLabels(self.group, labels_path, scan) for labels_path in scan.labels
+        ]
+        if get_option("well_stats"):
+            ch.append(PlateStats(self.group, scan))
+        return ch
 
 
 class PlateLabels(Plate):
-    def __init__(self, group: Group, labels_path: str):
-        super().__init__(group)
+    def __init__(
+        self, group: Group, labels_path: str, scan: PlateScan | None = None
+    ) -> None:
+        super().__init__(group, scan)
         self.labels_path = labels_path
 
+    def _narrow(self, data: list[da.core.Array]) -> list[da.core.Array]:
+        if not get_option("narrow_labels"):
+            return data
+        # the range of values is found from the (coarsest) stitched plate
+        return narrow_labels(data, known_label_values(self.first_image().group))
+
     def data(self) -> list[da.core.Array]:
         # return a dask pyramid...
-        return get_pyramid_lazy(self.group, self.labels_path)
+        return self._narrow(
+            get_pyramid_lazy(self.group, self.labels_path, scan=self.scan())
+        )
+
+    def coarsest_data(self) -> list[da.core.Array]:
+        return self._narrow(
+            get_pyramid_lazy(
+                self.group, self.labels_path, coarsest=True, scan=self.scan()
+            )
+        )
+
+    def first_image(self) -> Multiscales:
+        image_group = super().first_image().group
+        return Label(image_group["labels"][self.labels_path])
 
     def children(self) -> list[Spec]:
         # Need to override Plate.children()
         return []
 
+    def iter_wells(
+        self,
+        level: int = 0,
+        fields: Sequence[int] | None = None,
+        prefetch: int = 4,
+    ) -> Iterator[WellImage]:
+        # the label images of each field
+        return iter_wells(
+            self.group,
+            level,
+            fields,
+            self.labels_path,
+            prefetch,
+            self.layout,
+            self.acquisition,
+        )
+
     def metadata(self) -> dict:
-        # override Plate metadata (no channel-axis etc)
-        well_group = get_first_well(self.group)
-        first_field_path = get_first_field_path(well_group)
-        image_group = well_group[first_field_path]
-        labelimage_group = image_group["labels"][self.labels_path]
-        m = Label(labelimage_group).metadata()
+        # override Plate metadata (no channel-axis etc), from the image
+        # metadata of the first label image (not its colors or properties)
+        m = Multiscales.metadata(self.first_image())
         rv: dict[str, Any] = {"scale": m.get("scale", None)}
         if "axis_labels" in m:
             rv["axis_labels"] = m["axis_labels"]
@@ -555,6 +791,67 @@ class PlateLabels(Plate):
         return rv
 
 
+class PlateStats(Plate):
+    """A heatmap of the intensity statistics of each well (see well_stats)."""
+
+    def __init__(self, group: Group, scan: PlateScan | None = None) -> None:
+        super().__init__(group, scan)
+        self._table: pd.DataFrame | None = None
+
+    def well_stats(self) -> pd.DataFrame:
+        """The statistics of each channel of each well, from the lowest resolution."""
+        if self._table is None:
+            scan = self.scan()
+            self._table = get_well_stats(
+                scan,
+                len(scan.datasets[None]) - 1,
+                self.first_image().metadata().get("channel_axis"),
+                get_option("cache_dir"),
+            )
+        return self._table
+
+    def data(self) -> list[da.core.Array]:
+        heatmap = stats_heatmap(self.well_stats(), self.layout)
+        if self.first_image().metadata().get("channel_axis") is None:
+            heatmap = heatmap[:, 0]
+        return [da.from_array(heatmap)]
+
+    def coarsest_data(self) -> list[da.core.Array]:
+        return self.data()
+
+    def coarsest_scale_factors(self) -> List[float]:
+        return [1.0] * self.data()[0].ndim
+
+    def children(self) -> list[Spec]:
+        return []
+
+    def metadata(self) -> dict:
+        # one pixel per well, covering its cell of the stitched plate: the
+        # size of the largest image (see get_stitched_grid)
+        m = self.first_image().metadata()
+        shapes = [a.shape[-2:] for a in self.scan().well_arrays(0).values()]
+        tile_shape = [int(size) for size in np.max(shapes, axis=0)]
+        scale = m.get("scale") or [1.0, 1.0]
+        yx_scale = [s * size for s, size in zip(scale[-2:], tile_shape)]
+        yx_translate = [s * (size - 1) / 2 for s, size in zip(scale[-2:], tile_shape)]
+        rv: dict[str, Any] = {
+            "scale": [1.0, *yx_scale],
+            "translate": [0.0, *yx_translate],
+            "axis_labels": ("statistic", "y", "x"),
+            "colormap": "viridis",
+            "opacity": 0.5,
+            "metadata": {"well_stats": self.well_stats(), "statistics": STATISTICS},
+        }
+        names = m.get("name", "plate")
+        if "channel_axis" in m:
+            rv["channel_axis"] = 1
+            names = names if isinstance(names, list) else [names]
+            rv["name"] = [f"{name} (well stats)" for name in names]
+        else:
+            rv["name"] = f"{names} (well stats)"
+        return rv
+
+
 class Labels(Spec):
     @staticmethod
     def matches(group: Group) -> bool:
@@ -570,6 +867,12 @@ class Labels(Spec):
 
 
 class Label(Multiscales):
+    def __init__(self, group: Group) -> None:
+        super().__init__(group)
+        self._label_index: LabelIndex | None = None
+        self._properties: pd.DataFrame | None = None
+        self._properties_read = False
+
     @staticmethod
     def matches(group: Group) -> bool:
         # label must also be Multiscales
@@ -577,6 +880,12 @@ class Label(Multiscales):
             return False
         return "image-label" in Spec.get_attrs(group)
 
+    def _reduce_precision(
+        self, data: list[da.core.Array], start: int = 0
+    ) -> list[da.core.Array]:
+        # label values are kept as they are
+        return data
+
     def _splits_channels(self) -> bool:
         # A label is loaded as a single layer keeping all axes (no per-channel
         # split), so the channel axis must be retained in the per-axis metadata
@@ -597,6 +906,40 @@ class Label(Multiscales):
             transform = remove_axis_from_transform(transform, parent_channel_axis)
         self.parent_transforms.append(transform)
 
+    def _narrow(self, data: list[da.core.Array]) -> list[da.core.Array]:
+        if not get_option("narrow_labels"):
+            return data
+        return narrow_labels(data, known_label_values(self.group))
+
+    def data(self) -> list[da.core.Array]:
+        return self._narrow(super().data())
+
+    def coarsest_data(self) -> list[da.core.Array]:
+        return self._narrow(super().coarsest_data())
+
+    def label_index(self) -> LabelIndex:
+        # computed (or loaded from the cache) once per Label
+        if self._label_index is None:
+            self._label_index = get_label_index(
+                self.group,
+                get_option("label_index_level"),
+                get_option("cache_dir"),
+            )
+        return self._label_index
+
+    def properties(self) -> pd.DataFrame | None:
+        # read once per Label: metadata() is called more than once
+        if not self._properties_read:
+            # A columnar properties table takes precedence over the JSON properties
+            self._properties = read_properties_table(self.group)
+            if self._properties is None:
+                image_label = Spec.get_attrs(self.group).get("image-label", {})
+                props_list = image_label.get("properties", [])
+                if props_list:
+                    self._properties = properties_to_table(props_list)
+            self._properties_read = True
+        return self._properties
+
     def metadata(self) -> Dict[str, Any]:
         # override Multiscales metadata
         # call super
@@ -606,47 +949,10 @@ class Label(Multiscales):
 
         attrs = Spec.get_attrs(self.group)
         image_label = attrs.get("image-label", {})
-        colors: dict[int | bool, list[float]] = {}
-        color_list = image_label.get("colors", [])
-        if color_list:
-            for color in color_list:
-                try:
-                    label_value = color["label-value"]
-                    rgba = color.get("rgba", None)
-                    if rgba:
-                        rgba = [x / 255 for x in rgba]
-
-                    if isinstance(label_value, (bool, int)):
-                        colors[label_value] = rgba
-                    else:
-                        raise Exception("not bool or int")
-
-                except Exception:
-                    pass
-                    # LOGGER.exception("invalid color - %s", color)
-
-        props_list = image_label.get("properties", [])
-        if props_list:
-            props_by_labelid: dict[int, dict[str, str]] = {}
-            for props in props_list:
-                label_val = props["label-value"]
-                props_by_labelid[label_val] = dict(props)
-                del props_by_labelid[label_val]["label-value"]
-
-            properties: Dict[str, List] = {}
-            # First, create lists for all existing keys...
-            for label_id, props_dict in props_by_labelid.items():
-                for key in props_dict.keys():
-                    properties[key] = []
-
-            keys = list(properties.keys())
-
-            properties["index"] = []
-            for label_id, props_dict in props_by_labelid.items():
-                properties["index"].append(label_id)
-                # ...in case some objects don't have all the keys
-                for key in keys:
-                    properties[key].append(props_dict.get(key, None))
+        color_values, color_rgba = colors_to_arrays(image_label.get("colors", []))
+
+        properties = self.properties()
+        if properties is not None:
             ms_data["properties"] = properties
 
         rsp = {
@@ -655,68 +961,135 @@ class Label(Multiscales):
             **ms_data,
         }
         # in case no colors, don't set colormap (no labels will be shown)
-        if len(colors) > 0:
-            rsp["colormap"] = colors
+        if len(color_values) > 0:
+            rsp["colormap"] = label_colormap(color_values, color_rgba)
 
         return rsp
 
 
-def read_ome_zarr(root_group: Group) -> Callable:
-    def f(*args: Any, **kwargs: Any) -> List[LayerData]:
-        results: List[LayerData] = list()
+def _trace_layer(node_type: str, layer: LayerData) -> None:
+    # count the dask tasks of a layer and add a summary of it to profile reports
+    data, metadata, layer_type = layer
+    tasks = sum(len(level.__dask_graph__()) for level in data)
+    tracing.count("dask_tasks", tasks)
+    tracing.record_layer(
+        {
+            "name": metadata.get("name"),
+            "type": layer_type,
+            "spec": node_type,
+            "shapes": [list(level.shape) for level in data],
+            "dtype": str(data[0].dtype) if data else None,
+            "dask_tasks": tasks,
+        }
+    )
 
-        print("Root group", root_group.attrs.asdict())
 
-        spec: Spec | None = None
+def root_spec(root_group: Group) -> Spec | None:
+    """The Spec to start reading a root group from (None if unsupported)."""
+    spec: Spec | None = None
 
-        if Labels.matches(root_group):
-            # Try starting at parent Image
-            parent_path = root_group.store.root.parent
-            parent_group = zarr.open_group(parent_path)
+    if Labels.matches(root_group):
+        # Try starting at parent Image
+        spec = Labels(root_group)
+        try:
+            parent_group = open_parent_group(root_group)
             if Multiscales.matches(parent_group):
                 spec = Multiscales(parent_group)
-            else:
-                # not sure how to handle this?
-                spec = Labels(root_group)
-        elif Label.matches(root_group):
-            # Try starting at parent Image - up 2 dirs
-            parent_path = root_group.store.root.parent.parent
-            parent_group = zarr.open_group(parent_path)
+        except Exception as e:
+            # not sure how to handle this?
+            LOGGER.debug("Can't open parent image of labels: %s", e)
+    elif Label.matches(root_group):
+        # Try starting at parent Image - up 2 dirs
+        spec = Label(root_group)
+        try:
+            parent_group = open_parent_group(root_group, levels=2)
             if Multiscales.matches(parent_group):
                 spec = Multiscales(parent_group)
-            else:
-                # not sure how to handle this?
-                spec = Label(root_group)
-        elif Bioformats2raw.matches(root_group):
-            spec = Bioformats2raw(root_group)
-        elif Multiscales.matches(root_group):
-            spec = Multiscales(root_group)
-        elif Plate.matches(root_group):
-            spec = Plate(root_group)
-        elif Scene.matches(root_group):
-            spec = Scene(root_group)
-        else:
-            print("No matching spec", root_group)
+        except Exception as e:
+            # not sure how to handle this?
+            LOGGER.debug("Can't open parent image of label: %s", e)
+    elif Bioformats2raw.matches(root_group):
+        spec = Bioformats2raw(root_group)
+    elif Multiscales.matches(root_group):
+        spec = Multiscales(root_group)
+    elif Plate.matches(root_group):
+        spec = Plate(root_group)
+    elif Scene.matches(root_group):
+        spec = Scene(root_group)
+    else:
+        LOGGER.info("No matching spec for %s", root_group)
+    return spec
+
+
+def layer_type(node: Spec) -> str:
+    if Label.matches(node.group) or isinstance(node, PlateLabels):
+        return "labels"
+    return "image"
 
-        if spec:
-            nodes = list(spec.iter_nodes())
-            for node in nodes:
-                node_data = node.data()
-                metadata = node.metadata()
-                layer_type = "image"
-                if Label.matches(node.group) or isinstance(node, PlateLabels):
-                    layer_type = "labels"
-                    # napari "labels" layer MUST not have "channel_axis"
-                    if "channel_axis" in metadata:
-                        ch_axis = metadata.pop("channel_axis")
-                        # also splice out channel_axis from node_data if present
-                        for level in range(len(node_data)):
-                            darray = node_data[level]
-                            if darray.ndim > ch_axis:
-                                node_data[level] = da.squeeze(darray, axis=ch_axis)
-                rv: LayerData = (node_data, metadata, layer_type)
-                results.append(rv)
 
+def node_layer(node: Spec, coarsest: bool = False) -> LayerData:
+    """
+    The napari layer data of a node: all of its pyramid, or (if coarsest) only
+    its lowest resolution, scaled to the size of the full resolution.
+    """
+    node_type = type(node).__name__
+    with tracing.timed(f"{node_type}.data"):
+        node_data = node.coarsest_data() if coarsest else node.data()
+    with tracing.timed(f"{node_type}.metadata"):
+        metadata = node.metadata()
+    if coarsest and "scale" in metadata:
+        factors = node.coarsest_scale_factors()
+        if "channel_axis" in metadata and len(factors) > len(metadata["scale"]):
+            factors.pop(metadata["channel_axis"])
+        metadata["scale"] = [s * f for s, f in zip(metadata["scale"], factors)]
+    if isinstance(node, Label) and get_option("label_index"):
+        # for jumping to a label without scanning the data. Only for the layer:
+        # metadata() is also called for other nodes (e.g. PlateLabels)
+        metadata.setdefault("metadata", {})["label_index"] = node.label_index()
+    rv_type = layer_type(node)
+    if rv_type == "labels":
+        # napari "labels" layer MUST not have "channel_axis"
+        if "channel_axis" in metadata:
+            ch_axis = metadata.pop("channel_axis")
+            # also splice out channel_axis from node_data if present
+            for level in range(len(node_data)):
+                darray = node_data[level]
+                if darray.ndim > ch_axis:
+                    node_data[level] = da.squeeze(darray, axis=ch_axis)
+    rv: LayerData = (node_data, metadata, rv_type)
+    if tracing.enabled():
+        _trace_layer(node_type, rv)
+    return rv
+
+
+def read_ome_zarr(
+    root_group: Group, counts_before: Dict[str, int] | None = None
+) -> Callable:
+    # (counts_before: a tracing.counts() snapshot to log the counts since, e.g.
+    # from before the metadata was prefetched)
+    def f(*args: Any, **kwargs: Any) -> List[LayerData]:
+        results: List[LayerData] = list()
+
+        LOGGER.debug("Root group %s", root_group)
+        since = tracing.counts() if counts_before is None else counts_before
+
+        spec = root_spec(root_group)
+        if spec:
+            with tracing.timed("read_ome_zarr"):
+                with tracing.timed("iter_nodes"):
+                    nodes = list(spec.iter_nodes())
+                for node in nodes:
+                    results.append(node_layer(node))
+
+        if tracing.enabled():
+            counts = tracing.counts_since(since)
+            LOGGER.debug(
+                "Read %d layers from %s: %s",
+                len(results),
+                root_group,
+                counts,
+                extra={"counts": counts},
+            )
         return results
 
     return f
@@ -1,7 +1,23 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterator, List, NamedTuple, Sequence, Tuple, cast
+
 import dask.array as da
 import numpy as np
 from numpy._typing import DTypeLike
-from zarr import Group
+from zarr import Array, AsyncArray, Group
+from zarr.core.sync import sync
+
+from . import tracing
+from .arrays import from_zarr
+
+LOGGER = logging.getLogger(__name__)
+
+# arrays opened at once when scanning a plate
+_MAX_CONCURRENT_OPENS = 32
 
 
 def get_attrs(group: Group) -> dict:
@@ -10,37 +26,251 @@ def get_attrs(group: Group) -> dict:
     return group.attrs
 
 
-def get_pyramid_lazy(plate_group: Group, labels_path: str | None = None) -> list:
+class PlateLayout:
     """
-    Return a pyramid of dask data, where the highest resolution is the
-    stitched full-resolution images.
+    The well at each row and column of a plate, indexed once from the plate
+    metadata, and the shapes of the well images opened to stitch the plate.
     """
-    # plate_data = plate_group.attrs["plate"]
-    # well_paths = [well["path"] for well in plate_data.get("wells")]
-    # well_paths.sort()
 
-    # Get the first well...
-    well_group = get_first_well(plate_group)
-    first_field_path = get_first_field_path(well_group)
+    def __init__(self, plate_data: dict) -> None:
+        self.rows = [row["name"] for row in plate_data.get("rows", [])]
+        self.columns = [col["name"] for col in plate_data.get("columns", [])]
+        self.grid: List[List[str | None]] = [
+            [None] * len(self.columns) for _ in self.rows
+        ]
+        # shape of each array (by path in the store) opened in the wells
+        self.shapes: Dict[str, Tuple[int, ...]] = {}
+        row_indexes = {name: index for index, name in enumerate(self.rows)}
+        col_indexes = {name: index for index, name in enumerate(self.columns)}
+        for well in plate_data.get("wells", []):
+            path = well["path"]
+            row = well.get("rowIndex")
+            col = well.get("columnIndex")
+            if row is None or col is None:
+                # before v0.4: the path is "row_name/column_name"
+                row_name, _, col_name = path.partition("/")
+                row, col = row_indexes.get(row_name), col_indexes.get(col_name)
+            if (
+                row is None
+                or col is None
+                or not (0 <= row < len(self.rows) and 0 <= col < len(self.columns))
+            ):
+                LOGGER.warning("Well %s is not in a row and column of the plate", path)
+                continue
+            self.grid[row][col] = path
 
-    if labels_path:
-        first_field_path = first_field_path + "/labels/" + labels_path
+    @classmethod
+    def from_group(cls, plate_group: Group) -> "PlateLayout":
+        return cls(get_attrs(plate_group)["plate"])
+
+    def well_path(self, row: int, col: int) -> str | None:
+        """The path of the well at a row and column, or None if there's none."""
+        return self.grid[row][col]
+
+    def well_paths(self) -> List[str]:
+        """The paths of the wells, in row then column order."""
+        return [path for row in self.grid for path in row if path]
+
+
+class PlateScan:
+    """
+    The arrays of the image, and of each label image, of a field of every
+    well: the first field, or the first of an acquisition. They are found from
+    the first well, and opened one level at a time, for the image and all the
+    label images in a single (concurrent) pass, shared by the Plate and
+    PlateLabels read from the plate.
+    """
+
+    def __init__(
+        self,
+        plate_group: Group,
+        layout: PlateLayout | None = None,
+        acquisition: int | None = None,
+    ) -> None:
+        self.plate_group = plate_group
+        self.layout = layout or PlateLayout.from_group(plate_group)
+        self.acquisition = acquisition
+        # the field of each well, if not the first field of all of them
+        self.field_paths: Dict[str, str] | None = None
+        if acquisition is None:
+            # We assume all wells have the images (and labels) of the first one
+            well_group = get_first_well(plate_group)
+            self.first_well_path = well_group.path[len(plate_group.path) :].strip("/")
+            self.field_path = get_first_field_path(well_group)
+        else:
+            well_group = self._find_acquisition(acquisition)
+        self.image_group = cast(Group, well_group[self.field_path])
+        # dataset paths of the image (None) and of each label image
+        self.datasets: Dict[str | None, List[str]] = {
+            None: _dataset_paths(self.image_group)
+        }
+        labels_group = self.image_group.get("labels", None)
+        if isinstance(labels_group, Group):
+            for name in get_attrs(labels_group).get("labels", []):
+                try:
+                    label_group = cast(Group, labels_group[name])
+                    self.datasets[name] = _dataset_paths(label_group)
+                except KeyError:
+                    LOGGER.warning("Label image %s is missing", name)
+        self._levels: Dict[int, Dict[str, Array]] = {}
+        self._lock = threading.Lock()
+
+    def _find_acquisition(self, acquisition: int) -> Group:
+        """Find the field of each well imaged in an acquisition."""
+        plate_data = get_attrs(self.plate_group)["plate"]
+        ids = [a["id"] for a in plate_data.get("acquisitions", [])]
+        if ids and acquisition not in ids:
+            raise ValueError(f"Acquisition {acquisition} is not one of {ids}")
+        well_paths = self.layout.well_paths()
+        # the metadata of all wells (but none of their images) at once
+        with tracing.timed("PlateScan.wells"):
+            well_groups = _open_nodes(self.plate_group, well_paths)
+        self.field_paths = {}
+        for well_path in well_paths:
+            well_group = well_groups.get(well_path)
+            if not isinstance(well_group, Group):
+                continue
+            for image in get_attrs(well_group)["well"]["images"]:
+                if image.get("acquisition") == acquisition:
+                    self.field_paths[well_path] = image["path"]
+                    break
+        if not self.field_paths:
+            raise ValueError(f"No wells have images of acquisition {acquisition}")
+        self.first_well_path = next(iter(self.field_paths))
+        self.field_path = self.field_paths[self.first_well_path]
+        return cast(Group, well_groups[self.first_well_path])
+
+    @property
+    def labels(self) -> List[str]:
+        """The names of the label images."""
+        return [name for name in self.datasets if name is not None]
+
+    def well_paths(self) -> List[str]:
+        """The wells that have an image, in row then column order."""
+        if self.field_paths is not None:
+            return list(self.field_paths)
+        return self.layout.well_paths()
+
+    def image_path(
+        self, labels_path: str | None = None, well_path: str | None = None
+    ) -> str:
+        """The path of the image (or label image) in a well (or the first)."""
+        field_path = self.field_path
+        if well_path is not None and self.field_paths is not None:
+            field_path = self.field_paths[well_path]
+        if labels_path:
+            return f"{field_path}/labels/{labels_path}"
+        return field_path
+
+    def array_path(self, well_path: str, labels_path: str | None, level: int) -> str:
+        """The path in the plate of a level (index) of an image of a well."""
+        dataset_path = self.datasets[labels_path or None][level]
+        return f"{well_path}/{self.image_path(labels_path, well_path)}/{dataset_path}"
+
+    def open_level(self, level: int) -> Dict[str, Array]:
+        """
+        The arrays of a level (index) of the images and label images of each
+        well, by path in the plate. Arrays that are missing are left out.
+        """
+        with self._lock:
+            if level not in self._levels:
+                paths = [
+                    self.array_path(well_path, labels_path, level)
+                    for well_path in self.well_paths()
+                    for labels_path, datasets in self.datasets.items()
+                    if level < len(datasets)
+                ]
+                with tracing.timed("PlateScan.open_level"):
+                    nodes = _open_nodes(self.plate_group, paths)
+                self._levels[level] = {
+                    path: node
+                    for path, node in nodes.items()
+                    if isinstance(node, Array)
+                }
+            return self._levels[level]
+
+    def well_arrays(
+        self, level: int, labels_path: str | None = None
+    ) -> Dict[str, Array]:
+        """
+        The arrays of a level (index) of the image (or a label image) of each
+        well, by well path, in well order. Wells without one are left out.
+        """
+        opened = self.open_level(level)
+        arrays = {}
+        for well_path in self.well_paths():
+            array = opened.get(self.array_path(well_path, labels_path, level))
+            if array is not None:
+                arrays[well_path] = array
+        return arrays
+
+
+def _dataset_paths(image_group: Group) -> List[str]:
+    return [ds["path"] for ds in get_attrs(image_group)["multiscales"][0]["datasets"]]
+
+
+def _open_nodes(group: Group, paths: List[str]) -> Dict[str, Array | Group]:
+    """Open the arrays or groups at paths in a group concurrently."""
+
+    async def open_all() -> List[Array | Group | None]:
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_OPENS)
+
+        async def open_one(path: str) -> Array | Group | None:
+            async with semaphore:
+                try:
+                    node = await group._async_group.getitem(path)
+                except (KeyError, FileNotFoundError):
+                    return None
+            return Array(node) if isinstance(node, AsyncArray) else Group(node)
+
+        return await asyncio.gather(*(open_one(path) for path in paths))
+
+    nodes = sync(open_all())
+    return {path: node for path, node in zip(paths, nodes) if node is not None}
+
+
+def get_pyramid_lazy(
+    plate_group: Group,
+    labels_path: str | None = None,
+    coarsest: bool = False,
+    layout: PlateLayout | None = None,
+    scan: PlateScan | None = None,
+) -> list:
+    """
+    Return a pyramid of dask data, where the highest resolution is the
+    stitched full-resolution images (or, if coarsest, only the lowest
+    resolution, stitched from the lowest resolution of the images).
 
-    print("get_pyramid_lazy: first_field_path", first_field_path)
-    image_group = well_group[first_field_path]
+    ``layout`` is the plate's layout, if already indexed, and ``scan`` its
+    arrays, if shared with other pyramids of the plate (or of another
+    acquisition than the first field of each well).
+    """
+    if scan is None:
+        scan = PlateScan(plate_group, layout)
+    first_field_path = scan.image_path(labels_path)
+    LOGGER.debug("get_pyramid_lazy: first_field_path %s", first_field_path)
 
-    # We assume all images are same shape & dtype as the first one
-    paths = [ds["path"] for ds in get_attrs(image_group)["multiscales"][0]["datasets"]]
-    img_pyramid = [da.from_zarr(image_group[path]) for path in paths]
-    img_pyramid_shapes = [d.shape for d in img_pyramid]
-    numpy_type = img_pyramid[0].dtype
+    paths = scan.datasets[labels_path or None]
+    levels = range(len(paths))
+    if coarsest:
+        levels = levels[-1:]
 
     # Create a dask pyramid for the plate
     pyramid = []
-    for level, tile_shape in enumerate(img_pyramid_shapes):
-        lazy_plate = get_stitched_grid(
-            plate_group, paths[level], tile_shape, numpy_type, first_field_path
-        )
+    for level in levels:
+        arrays = scan.well_arrays(level, labels_path)
+        # The size of the grid cells, if all images are the same shape as the first
+        first = arrays[scan.first_well_path]
+        with tracing.timed("get_stitched_grid"):
+            lazy_plate = get_stitched_grid(
+                plate_group,
+                paths[level],
+                first.shape,
+                first.dtype,
+                first_field_path,
+                scan.layout,
+                arrays,
+            )
         pyramid.append(lazy_plate)
 
     # Use the first image's metadata for viewing the whole Plate
@@ -57,41 +287,64 @@ def get_stitched_grid(
     tile_shape: tuple,
     numpy_type: DTypeLike,
     first_field_path: str,
+    layout: PlateLayout | None = None,
+    arrays: Dict[str, Array] | None = None,
 ) -> da.core.Array:
-    plate_data = get_attrs(plate_group)["plate"]
-    rows = plate_data.get("rows")
-    columns = plate_data.get("columns")
-    row_names = [row["name"] for row in rows]
-    col_names = [col["name"] for col in columns]
-
-    well_paths = [well["path"] for well in plate_data.get("wells")]
-    well_paths.sort()
-
-    row_count = len(rows)
-    column_count = len(columns)
+    """
+    Stitch the level of the images at first_field_path of each well into a
+    grid of the plate's rows and columns. Each cell of the grid is the size of
+    the largest image: smaller images are padded (lazily) and missing ones
+    are zeros.
 
-    def get_tile(row: int, col: int) -> da.core.Array:
-        """tile_name is 'level,z,c,t,row,col'"""
+    ``arrays`` are the arrays of the level already opened (see PlateScan), by
+    well path: if given, wells without an array are zeros, otherwise arrays
+    are opened here.
+    """
+    if layout is None:
+        layout = PlateLayout.from_group(plate_group)
 
-        # check whether the Well exists at this row/column
-        well_path = f"{row_names[row]}/{col_names[col]}"
-        if well_path not in well_paths:
-            return np.zeros(tile_shape, dtype=numpy_type)
+    tiles: Dict[Tuple[int, int], da.core.Array] = {}
+    for row in range(len(layout.rows)):
+        for col in range(len(layout.columns)):
+            well_path = layout.well_path(row, col)
+            if well_path is None:
+                continue
+            img_path = f"{well_path}/{first_field_path}/{level}"
+            try:
+                array = (
+                    arrays[well_path]
+                    if arrays is not None
+                    else cast(Array, plate_group[img_path])
+                )
+                # this is a dask array - data not loaded from source yet
+                data = from_zarr(array)
+            except (ValueError, KeyError):
+                # FIXME: check the Well to get the actual first field path
+                continue
+            if data.ndim != len(tile_shape):
+                LOGGER.warning("%s doesn't have %s dimensions", img_path, data.ndim)
+                continue
+            layout.shapes[array.path] = data.shape
+            tiles[row, col] = data
 
-        img_path = f"{well_path}/{first_field_path}/{level}"
+    shapes = [tile_shape, *(t.shape for t in tiles.values())]
+    cell_shape = tuple(int(size) for size in np.max(shapes, axis=0))
+    dtype = np.result_type(numpy_type, *(t.dtype for t in tiles.values()))
 
-        try:
-            # this is a dask array - data not loaded from source yet
-            data = da.from_zarr(plate_group[img_path])
-        except (ValueError, KeyError):
-            # FIXME: check the Well to get the actual first field path
-            data = da.zeros(tile_shape, dtype=numpy_type)
-        return data
+    def get_tile(row: int, col: int) -> da.core.Array:
+        data = tiles.get((row, col))
+        if data is None:
+            return da.zeros(cell_shape, dtype=dtype, chunks=cell_shape)
+        if data.shape != cell_shape:
+            data = da.pad(data, [(0, c - s) for c, s in zip(cell_shape, data.shape)])
+        return data.astype(dtype, copy=False)
 
     lazy_rows = []
     # For level 0, return whole image for each tile
-    for row in range(row_count):
-        lazy_row: list[da.Array] = [get_tile(row, col) for col in range(column_count)]
+    for row in range(len(layout.rows)):
+        lazy_row: list[da.Array] = [
+            get_tile(row, col) for col in range(len(layout.columns))
+        ]
         lazy_rows.append(da.concatenate(lazy_row, axis=len(lazy_row[0].shape) - 1))
     return da.concatenate(lazy_rows, axis=len(lazy_rows[0].shape) - 2)
 
@@ -102,7 +355,8 @@ def get_first_well(plate_group: Group) -> Group:
     well_paths.sort()
 
     # Get the first well...
-    well_group = plate_group[well_paths[0]]
+    with tracing.timed("get_first_well"):
+        well_group = plate_group[well_paths[0]]
     if well_group is None:
         raise Exception("Could not find first well")
     return well_group
@@ -115,3 +369,92 @@ def get_first_field_path(well_group: Group) -> str:
 
     first_field_path = well_data["images"][0]["path"]
     return first_field_path
+
+
+class WellImage(NamedTuple):
+    """An image (or label image) of one field of a well, read by iter_wells()."""
+
+    well: str  # path of the well, e.g. "A/1"
+    field: str  # path of the field (image) in the well, e.g. "0"
+    level: str  # path of the resolution level (array) in the image
+    data: np.ndarray
+
+
+def get_well_paths(plate_group: Group) -> List[str]:
+    """The paths of the wells of a plate, in row then column order."""
+    return PlateLayout.from_group(plate_group).well_paths()
+
+
+def _read_well_image(
+    plate_group: Group, well: str, field: str, level: int, labels_path: str | None
+) -> WellImage:
+    image_path = f"{well}/{field}"
+    if labels_path:
+        image_path = f"{image_path}/labels/{labels_path}"
+    image_group = cast(Group, plate_group[image_path])
+    datasets = get_attrs(image_group)["multiscales"][0]["datasets"]
+    level_path = datasets[level]["path"]
+    with tracing.timed("read_well_image"):
+        data = np.asarray(cast(Array, image_group[level_path])[...])
+    return WellImage(well, field, level_path, data)
+
+
+def iter_wells(
+    plate_group: Group,
+    level: int = 0,
+    fields: Sequence[int] | None = None,
+    labels_path: str | None = None,
+    prefetch: int = 4,
+    layout: PlateLayout | None = None,
+    acquisition: int | None = None,
+) -> Iterator[WellImage]:
+    """
+    Read the images of each well of a plate, in well order (rows then columns)
+    and then field order, as numpy arrays.
+
+    ``level`` is the index of the resolution level to read (0 is the full
+    resolution), ``fields`` the indexes of the fields to read in each well (all
+    if None, or those of ``acquisition`` if given) and ``labels_path`` the name
+    of a label image to read instead of the images. Up to ``prefetch`` images
+    are read ahead, in parallel, while the caller processes the current one:
+    reading pauses when they have not been consumed, so memory use doesn't grow
+    with the size of the plate. ``layout`` is the plate's layout, if already
+    indexed.
+    """
+    if layout is None:
+        layout = PlateLayout.from_group(plate_group)
+
+    def images() -> Iterator[tuple]:
+        for well in layout.well_paths():
+            try:
+                well_group = cast(Group, plate_group[well])
+            except KeyError:
+                LOGGER.warning("Well %s of the plate metadata is missing", well)
+                continue
+            field_paths = [
+                image["path"]
+                for image in get_attrs(well_group)["well"]["images"]
+                if acquisition is None or image.get("acquisition") == acquisition
+            ]
+            if fields is not None:
+                field_paths = [field_paths[i] for i in fields if i < len(field_paths)]
+            for field in field_paths:
+                yield well, field
+
+    pending: Deque[Future] = deque()
+    with ThreadPoolExecutor(max(1, prefetch)) as executor:
+        try:
+            for well, field in images():
+                pending.append(
+                    executor.submit(
+                        _read_well_image, plate_group, well, field, level, labels_path
+                    )
+                )
+                if len(pending) > prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # e.g. if the caller stops iterating: don't wait for unused reads
+            for future in pending:
+                future.cancel()
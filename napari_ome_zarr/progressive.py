@@ -0,0 +1,110 @@
+"""Progressive reading: the coarsest resolution first, the rest in the background.
+
+When the ``progressive`` option is set and the reader is called from a napari
+viewer, the reader only opens the first node of a dataset (e.g. the image, the
+plate or the first series) and returns a layer of its lowest resolution, so
+that something is shown after a few metadata requests. The full pyramid of
+that node, then the other nodes (labels, plate labels, other series or scene
+images) are read in a background thread, and added to the viewer as they are
+ready: the coarse layer is replaced by a multiscale layer of the full pyramid.
+"""
+
+import itertools
+import logging
+from typing import Any, Callable, Iterator, List, Tuple
+
+from napari.components import ViewerModel
+from zarr import Group
+
+from .ome_zarr_reader import LayerData, node_layer, read_ome_zarr, root_spec
+
+LOGGER = logging.getLogger(__name__)
+
+# key in the layer "metadata" of the layers that a later update replaces
+PROGRESSIVE_ID = "napari_ome_zarr_progressive_id"
+
+_IDS = itertools.count()
+
+# (id of the layers to replace, or None to add a layer; the layer data)
+LayerUpdate = Tuple[int | None, LayerData]
+
+
+class ProgressiveRead:
+    """
+    Read a group in two steps: first_layers() quickly returns the coarsest
+    resolution of its first node, then updates() yields the layers that
+    replace it and the layers of the other nodes.
+    """
+
+    def __init__(self, root_group: Group) -> None:
+        self.root_group = root_group
+        spec = root_spec(root_group)
+        self._nodes = iter(spec.iter_nodes()) if spec is not None else iter(())
+        self._first = next(self._nodes, None)
+        self.id = next(_IDS)
+
+    def first_layers(self) -> List[LayerData]:
+        if self._first is None:
+            return []
+        data, metadata, layer_type = node_layer(self._first, coarsest=True)
+        metadata["metadata"] = {**metadata.get("metadata", {}), PROGRESSIVE_ID: self.id}
+        return [(data, metadata, layer_type)]
+
+    def updates(self) -> Iterator[LayerUpdate]:
+        if self._first is None:
+            return
+        yield self.id, node_layer(self._first)
+        for node in self._nodes:
+            yield None, node_layer(node)
+
+
+def apply_update(viewer: ViewerModel, update: LayerUpdate) -> None:
+    """Add the layer of an update to a viewer, replacing the coarse layers."""
+    layer_id, (data, metadata, layer_type) = update
+    replaced = [
+        index
+        for index, layer in enumerate(viewer.layers)
+        if layer_id is not None and layer.metadata.get(PROGRESSIVE_ID) == layer_id
+    ]
+    if layer_id is not None and not replaced:
+        # the coarse layers have been deleted (or not added yet): skip
+        LOGGER.debug("No layers to replace for progressive read %s", layer_id)
+        return
+    for index in reversed(replaced):
+        viewer.layers.pop(index)
+    added = getattr(viewer, f"add_{layer_type}")(data, **metadata)
+    if replaced:
+        # put the new layers where the coarse ones were
+        added = added if isinstance(added, list) else [added]
+        count = len(viewer.layers)
+        viewer.layers.move_multiple(range(count - len(added), count), replaced[0])
+
+
+def _start_updates(viewer: ViewerModel, read: ProgressiveRead) -> None:
+    from napari.qt.threading import create_worker
+
+    worker = create_worker(read.updates)
+    worker.yielded.connect(lambda update: apply_update(viewer, update))
+    worker.errored.connect(lambda e: LOGGER.error("Progressive read failed: %s", e))
+    worker.start()
+
+
+def progressive_reader(root_group: Group) -> Callable:
+    """
+    A reader that returns the coarsest layer of root_group and adds the rest to
+    the current napari viewer in the background, or reads everything (as
+    read_ome_zarr) if there's no viewer to add it to.
+    """
+
+    def f(*args: Any, **kwargs: Any) -> List[LayerData]:
+        import napari
+
+        viewer = napari.current_viewer()
+        if viewer is None:
+            return read_ome_zarr(root_group)(*args, **kwargs)
+        read = ProgressiveRead(root_group)
+        layers = read.first_layers()
+        _start_updates(viewer, read)
+        return layers
+
+    return f
@@ -0,0 +1,84 @@
+"""Snapshots of the metadata of datasets, to open them again without requests.
+
+Opening a large plate or series of images reads a metadata document for every
+group and array in it, which can take minutes over HTTP. With the
+``metadata_snapshot`` option, the documents read when a dataset is opened are
+saved in ``cache_dir``, keyed by its URL (or path). The next time it's opened,
+they're read from the snapshot instead of the store, if the metadata of the
+root group (read when it's opened) hasn't changed. Changes to the metadata of
+other nodes without a change to the root aren't noticed: delete the snapshot
+(or turn the option off) to read them.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+from typing import Dict
+
+from zarr import Group
+from zarr.core.buffer import Buffer, default_buffer_prototype
+
+from .store import _unwrap
+
+LOGGER = logging.getLogger(__name__)
+
+
+def snapshot_key(group: Group) -> str:
+    """The URL (or path) of a group, that its snapshot is saved for."""
+    return f"{_unwrap(group.store)}/{group.path}"
+
+
+def validator(group: Group) -> str:
+    """A digest of the metadata of the root group of a snapshot."""
+    metadata = json.dumps(group.metadata.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha1(metadata.encode()).hexdigest()
+
+
+def _snapshot_path(key: str, cache_dir: str) -> str:
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(cache_dir, "metadata-snapshots", f"{digest}.json")
+
+
+def load_snapshot(group: Group, cache_dir: str) -> Dict[str, Buffer | None] | None:
+    """
+    The metadata documents (None for keys that don't exist) of the snapshot
+    of a group, or None if there's no snapshot or it's out of date.
+    """
+    path = _snapshot_path(snapshot_key(group), cache_dir)
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("key") != snapshot_key(group):
+        return None
+    if snapshot.get("validator") != validator(group):
+        LOGGER.debug("Snapshot of %s is out of date", snapshot["key"])
+        return None
+    prototype = default_buffer_prototype()
+    return {
+        key: None if doc is None else prototype.buffer.from_bytes(base64.b64decode(doc))
+        for key, doc in snapshot["documents"].items()
+    }
+
+
+def save_snapshot(
+    group: Group, documents: Dict[str, Buffer | None], cache_dir: str
+) -> None:
+    """Save the metadata documents read from (the hierarchy of) a group."""
+    path = _snapshot_path(snapshot_key(group), cache_dir)
+    snapshot = {
+        "key": snapshot_key(group),
+        "validator": validator(group),
+        "documents": {
+            key: None if buf is None else base64.b64encode(buf.to_bytes()).decode()
+            for key, buf in documents.items()
+        },
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # (replaced at once, so a snapshot being read is never half written)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(snapshot, f)
+    os.replace(f"{path}.tmp", path)
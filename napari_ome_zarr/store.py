@@ -0,0 +1,305 @@
+"""Opening of the zarr stores read by the plugin."""
+
+import asyncio
+import atexit
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+import fsspec
+import zarr
+import zarr.api.asynchronous
+from fsspec.asyn import AsyncFileSystem
+from zarr import Group
+from zarr.abc.store import ByteRequest, Store
+from zarr.core.buffer import Buffer, BufferPrototype
+from zarr.core.sync import sync
+from zarr.storage import FsspecStore, LocalStore, WrapperStore
+
+from . import tracing
+from .config import get_option
+
+_METADATA_KEYS = {"zarr.json", ".zgroup", ".zarray", ".zattrs", ".zmetadata"}
+
+
+def _is_metadata_key(key: str) -> bool:
+    return key.rsplit("/", 1)[-1] in _METADATA_KEYS
+
+
+class TracingStore(WrapperStore):
+    """Store that counts the requests and bytes read through it."""
+
+    def _count(self, key: str, buf: Buffer | None) -> None:
+        if not _is_metadata_key(key):
+            tracing.count("chunk_requests")
+            if buf is not None:
+                tracing.count("chunk_bytes", len(buf))
+            return
+        tracing.count("metadata_requests")
+        if buf is None:
+            return
+        tracing.count("metadata_bytes", len(buf))
+        name = key.rsplit("/", 1)[-1]
+        if name == "zarr.json":
+            node_type = json.loads(buf.to_bytes()).get("node_type")
+            tracing.count(f"{node_type}s_opened")
+        elif name in (".zgroup", ".zarray"):
+            tracing.count("groups_opened" if name == ".zgroup" else "arrays_opened")
+
+    async def get(
+        self,
+        key: str,
+        prototype: BufferPrototype,
+        byte_range: ByteRequest | None = None,
+    ) -> Buffer | None:
+        buf = await self._store.get(key, prototype, byte_range)
+        self._count(key, buf)
+        return buf
+
+    async def get_partial_values(
+        self,
+        prototype: BufferPrototype,
+        key_ranges: Iterable[tuple[str, ByteRequest | None]],
+    ) -> list[Buffer | None]:
+        key_ranges = list(key_ranges)
+        bufs = await self._store.get_partial_values(prototype, key_ranges)
+        for (key, _), buf in zip(key_ranges, bufs):
+            self._count(key, buf)
+        return bufs
+
+
+class MetadataCacheStore(WrapperStore):
+    """
+    Store that keeps the metadata documents it reads (and the metadata keys
+    that don't exist) in memory, so that they're only requested once.
+    """
+
+    def __init__(self, store: Store, cache: Dict[str, Buffer | None] | None = None):
+        super().__init__(store)
+        self.cache = {} if cache is None else cache
+
+    def _with_store(self, store: Store) -> "MetadataCacheStore":
+        return type(self)(store, self.cache)
+
+    async def get(
+        self,
+        key: str,
+        prototype: BufferPrototype,
+        byte_range: ByteRequest | None = None,
+    ) -> Buffer | None:
+        if byte_range is not None or not (
+            _is_metadata_key(key) or key.endswith(".xml")
+        ):
+            return await self._store.get(key, prototype, byte_range)
+        if key not in self.cache:
+            self.cache[key] = await self._store.get(key, prototype)
+        return self.cache[key]
+
+    async def exists(self, key: str) -> bool:
+        if key in self.cache:
+            return self.cache[key] is not None
+        return await self._store.exists(key)
+
+
+def _host(store: Store) -> str:
+    """The host that requests to a store are sent to ("" for local files)."""
+    if isinstance(store, FsspecStore):
+        protocol = store.fs.protocol
+        protocol = protocol[0] if isinstance(protocol, (tuple, list)) else protocol
+        # http(s) paths are full URLs; object store paths start with the bucket
+        netloc = urlparse(store.path).netloc or store.path.split("/", 1)[0]
+        return f"{protocol}://{netloc}"
+    return ""
+
+
+# one semaphore per (host, limit), shared by every store reading from the host
+_HOST_SEMAPHORES: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+
+
+class ConcurrencyLimitStore(WrapperStore):
+    """
+    Store that limits the number of requests in flight to the host of the
+    store, across all stores (and arrays) reading from that host.
+    """
+
+    def __init__(self, store: Store, limit: int | None = None) -> None:
+        super().__init__(store)
+        self.host = _host(_unwrap(store))
+        self.limit = limit or get_option("max_requests_per_host")
+
+    def _with_store(self, store: Store) -> "ConcurrencyLimitStore":
+        return type(self)(store, self.limit)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # only called from zarr's event loop, so needs no lock
+        key = (self.host, self.limit)
+        if key not in _HOST_SEMAPHORES:
+            _HOST_SEMAPHORES[key] = asyncio.Semaphore(self.limit)
+        return _HOST_SEMAPHORES[key]
+
+    async def get(
+        self,
+        key: str,
+        prototype: BufferPrototype,
+        byte_range: ByteRequest | None = None,
+    ) -> Buffer | None:
+        async with self._semaphore():
+            return await self._store.get(key, prototype, byte_range)
+
+    async def get_partial_values(
+        self,
+        prototype: BufferPrototype,
+        key_ranges: Iterable[tuple[str, ByteRequest | None]],
+    ) -> list[Buffer | None]:
+        async def get(key: str, byte_range: ByteRequest | None) -> Buffer | None:
+            return await self.get(key, prototype, byte_range)
+
+        return await asyncio.gather(*(get(key, rng) for key, rng in key_ranges))
+
+    async def exists(self, key: str) -> bool:
+        async with self._semaphore():
+            return await self._store.exists(key)
+
+
+def _wrap(store: Store) -> Store:
+    if get_option("max_requests_per_host"):
+        store = ConcurrencyLimitStore(store)
+    if tracing.enabled():
+        store = TracingStore(store)
+    return store
+
+
+def _unwrap(store: Store) -> Store:
+    while isinstance(store, WrapperStore):
+        store = store._store
+    return store
+
+
+# one filesystem per (protocol, connections_per_host, keepalive_timeout),
+# shared by every store opened by the plugin so that they share its pool of
+# connections (and don't each repeat the TLS handshake with a host)
+_FILESYSTEMS: Dict[Tuple[str, int, float], AsyncFileSystem] = {}
+_FILESYSTEMS_LOCK = threading.Lock()
+
+
+def _client_factory(limit_per_host: int, keepalive_timeout: float) -> Any:
+    async def get_client(**kwargs: Any) -> aiohttp.ClientSession:
+        # created in zarr's event loop, on the first request
+        connector = aiohttp.TCPConnector(
+            limit_per_host=limit_per_host, keepalive_timeout=keepalive_timeout
+        )
+        return aiohttp.ClientSession(connector=connector, **kwargs)
+
+    return get_client
+
+
+def _filesystem(protocol: str) -> AsyncFileSystem | None:
+    """The shared filesystem for a protocol, or None if it isn't async."""
+    key = (
+        protocol,
+        get_option("connections_per_host"),
+        get_option("keepalive_timeout"),
+    )
+    with _FILESYSTEMS_LOCK:
+        if key not in _FILESYSTEMS:
+            options: Dict[str, Any] = {
+                "asynchronous": True,
+                "skip_instance_cache": True,
+            }
+            if protocol in ("http", "https"):
+                options["get_client"] = _client_factory(*key[1:])
+            fs = fsspec.filesystem(protocol, **options)
+            if not fs.async_impl:
+                return None
+            _FILESYSTEMS[key] = fs
+        return _FILESYSTEMS[key]
+
+
+@atexit.register
+def _close_sessions() -> None:
+    # close the HTTP sessions while zarr's event loop is still running, so
+    # that aiohttp doesn't warn about unclosed sessions
+    sessions = [
+        fs._session for fs in _FILESYSTEMS.values() if getattr(fs, "_session", None)
+    ]
+    for session in sessions:
+        try:
+            sync(session.close())
+        except Exception:
+            pass
+
+
+def _fsspec_store(url: str) -> FsspecStore:
+    protocol = url.split("://", 1)[0]
+    fs = _filesystem(protocol)
+    if fs is None:
+        return FsspecStore.from_url(url, read_only=True)
+    return FsspecStore(fs, read_only=True, path=fs._strip_protocol(url))
+
+
+def open_store(path: str | Path) -> Store:
+    """
+    Create a read-only store for a local path or URL. Stores for URLs with the
+    same protocol share one fsspec filesystem and its pool of connections.
+    """
+    path = str(path)
+    if "://" in path and not path.startswith("file://"):
+        return _wrap(_fsspec_store(path))
+    return _wrap(LocalStore(path.removeprefix("file://"), read_only=True))
+
+
+def open_group(path: str | Path | Store) -> Group:
+    """Open a zarr group (read-only) at a local path or URL, or in a store."""
+    store = path if isinstance(path, Store) else open_store(path)
+    with tracing.timed("open_group"):
+        return zarr.open_group(store, mode="r")
+
+
+def open_groups(paths: Sequence[str | Path], limit: int = 8) -> List[Group | Exception]:
+    """
+    Open zarr groups (read-only) at several paths or URLs concurrently, with
+    at most ``limit`` being opened at once. Returns the group, or the error
+    raised when opening it, for each path.
+    """
+
+    async def open_all() -> List[Group | BaseException]:
+        semaphore = asyncio.Semaphore(limit)
+
+        async def open_one(path: str | Path) -> Group:
+            async with semaphore:
+                async_group = await zarr.api.asynchronous.open_group(
+                    open_store(path), mode="r"
+                )
+                return Group(async_group)
+
+        return await asyncio.gather(
+            *(open_one(path) for path in paths), return_exceptions=True
+        )
+
+    with tracing.timed("open_groups"):
+        groups = sync(open_all())
+    return [g if isinstance(g, (Group, Exception)) else Exception(g) for g in groups]
+
+
+def open_parent_group(group: Group, levels: int = 1) -> Group:
+    """
+    Open the group that is the given number of levels above a root group.
+
+    Raises an Exception if the parent is not a zarr group or its location is
+    not known for this type of store.
+    """
+    store = _unwrap(group.store)
+    if isinstance(store, LocalStore):
+        root = store.root
+        for _ in range(levels):
+            root = root.parent
+        return open_group(_wrap(LocalStore(root, read_only=True)))
+    if isinstance(store, FsspecStore):
+        path = store.path.rstrip("/")
+        for _ in range(levels):
+            path = path.rsplit("/", 1)[0]
+        return open_group(_wrap(FsspecStore(store.fs, read_only=True, path=path)))
+    raise ValueError(f"Can't find the parent of a {type(store).__name__}")
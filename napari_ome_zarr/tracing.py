@@ -0,0 +1,160 @@
+"""Logging, tracing and profiling of the reader.
+
+All messages are logged to the ``napari_ome_zarr`` logger. Set the
+``NAPARI_OME_ZARR_LOG_LEVEL`` environment variable (e.g. to ``DEBUG``) to print
+them to stderr. At ``DEBUG`` level, the reader also records how long each
+phase of opening takes and counts what it does (groups and arrays opened,
+store requests, bytes of metadata and chunks read).
+
+The same timings and counts can be collected into a report with
+:func:`profile`, e.g. to attach to a bug report::
+
+    with profile("report.json"):
+        layers = napari_get_reader(path)()
+
+When neither ``DEBUG`` logging nor a profile is enabled, nothing is timed or
+counted.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Any, Dict, Iterator, List
+
+LOGGER = logging.getLogger("napari_ome_zarr")
+
+_COUNTS: Counter = Counter()
+_LOCK = threading.Lock()
+
+
+class Profile:
+    """Timings, counts and layers recorded while a profile() is active."""
+
+    def __init__(self) -> None:
+        self.started = datetime.now(timezone.utc)
+        self.seconds = 0.0
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.counts: Counter = Counter()
+        self.layers: List[Dict[str, Any]] = []
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        stats = self.phases.setdefault(phase, {"calls": 0, "seconds": 0.0})
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started": self.started.isoformat(),
+            "seconds": self.seconds,
+            "phases": self.phases,
+            "counts": dict(self.counts),
+            "layers": self.layers,
+        }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+# active profiles: recorded to from any thread (e.g. the zarr event loop)
+_PROFILES: List[Profile] = []
+
+
+def _configure_from_env() -> None:
+    level = os.environ.get("NAPARI_OME_ZARR_LOG_LEVEL")
+    if level:
+        LOGGER.setLevel(level.upper())
+        if not LOGGER.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(
+                logging.Formatter("%(name)s %(levelname)s %(message)s")
+            )
+            LOGGER.addHandler(handler)
+
+
+_configure_from_env()
+
+
+def enabled() -> bool:
+    """Whether timings and counts are being recorded."""
+    return bool(_PROFILES) or LOGGER.isEnabledFor(logging.DEBUG)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add n to the named counter (if tracing is enabled)."""
+    if enabled():
+        with _LOCK:
+            _COUNTS[name] += n
+            for prof in _PROFILES:
+                prof.counts[name] += n
+
+
+def counts() -> Dict[str, int]:
+    """Return a snapshot of all counters."""
+    return dict(_COUNTS)
+
+
+def counts_since(snapshot: Dict[str, int]) -> Dict[str, int]:
+    """Return the change of each counter since an earlier snapshot."""
+    return {
+        name: value - snapshot.get(name, 0)
+        for name, value in _COUNTS.items()
+        if value != snapshot.get(name, 0)
+    }
+
+
+def record_layer(layer: Dict[str, Any]) -> None:
+    """Add a summary of a layer created by the reader to active profiles."""
+    with _LOCK:
+        for prof in _PROFILES:
+            prof.layers.append(layer)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Log how long the body takes (if tracing is enabled)."""
+    if not enabled():
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        with _LOCK:
+            for prof in _PROFILES:
+                prof.add_phase(phase, seconds)
+        LOGGER.debug(
+            "%s took %.3f s",
+            phase,
+            seconds,
+            extra={"phase": phase, "seconds": seconds},
+        )
+
+
+@contextmanager
+def profile(path: str | None = None) -> Iterator[Profile]:
+    """
+    Record the time spent in each phase of the reader, store requests, bytes
+    read, and the layers (with their dask graph sizes) created in the context.
+
+    If ``path`` is given, the report is written there as JSON on exit.
+    """
+    prof = Profile()
+    start = perf_counter()
+    with _LOCK:
+        _PROFILES.append(prof)
+    try:
+        yield prof
+    finally:
+        with _LOCK:
+            _PROFILES.remove(prof)
+        prof.seconds = perf_counter() - start
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(prof.to_json())
+            LOGGER.info("Wrote profile report to %s", path)
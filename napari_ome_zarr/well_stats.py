@@ -0,0 +1,127 @@
+"""Intensity statistics of each well of a plate, for quality control.
+
+The statistics of each channel of each well are computed from the lowest
+resolution of its image (so that reading a 1536-well plate takes seconds), in
+a bounded number of threads, and cached in ``cache_dir`` like label indexes.
+They are shown as a heatmap layer with one pixel per well, on top of the
+stitched plate, with the table of statistics in the layer metadata.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from zarr import Array
+
+from . import tracing
+from .plate import PlateLayout, PlateScan
+from .store import _unwrap
+
+# columns of the statistics in the table, and planes of the heatmap
+STATISTICS = ["mean", "min", "max", "p5", "p50", "p95"]
+
+# wells read at once
+_MAX_CONCURRENT_READS = 16
+
+
+def _array_stats(array: Array, channel_axis: int | None) -> np.ndarray:
+    """The STATISTICS (rows) of each channel (columns) of an array."""
+    data = np.asarray(array[...])
+    if channel_axis is None:
+        data = data[np.newaxis]
+    else:
+        data = np.moveaxis(data, channel_axis, 0)
+    data = data.reshape(data.shape[0], -1)
+    percentiles = np.percentile(data, [5, 50, 95], axis=1)
+    return np.vstack(
+        [data.mean(axis=1), data.min(axis=1), data.max(axis=1), percentiles]
+    )
+
+
+def compute_well_stats(
+    scan: PlateScan, level: int, channel_axis: int | None
+) -> pd.DataFrame:
+    """
+    The statistics of each channel of the images of a level (index) of each
+    well: a row per well and channel, with the well's path, row and column.
+    """
+    positions = {
+        path: (row, col)
+        for row, paths in enumerate(scan.layout.grid)
+        for col, path in enumerate(paths)
+        if path is not None
+    }
+    wells = list(scan.well_arrays(level).items())
+    with ThreadPoolExecutor(_MAX_CONCURRENT_READS) as executor:
+        stats = list(executor.map(lambda w: _array_stats(w[1], channel_axis), wells))
+
+    rows = []
+    for (path, _), well_stats in zip(wells, stats):
+        row, col = positions[path]
+        for channel in range(well_stats.shape[1]):
+            values = dict(zip(STATISTICS, well_stats[:, channel].tolist()))
+            rows.append(
+                {"well": path, "row": row, "column": col, "channel": channel, **values}
+            )
+    columns = ["well", "row", "column", "channel", *STATISTICS]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _cache_path(scan: PlateScan, level: int, cache_dir: str) -> str:
+    # the metadata of the array of every well, already read to open them
+    arrays = {
+        path: array.metadata.to_dict()
+        for path, array in scan.well_arrays(level).items()
+    }
+    key = json.dumps(
+        [
+            # the URL of the plate, however its store is opened (or wrapped)
+            f"{_unwrap(scan.plate_group.store)}/{scan.plate_group.path}",
+            scan.acquisition,
+            level,
+            arrays,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(cache_dir, "well-stats", f"{digest}.csv")
+
+
+def get_well_stats(
+    scan: PlateScan, level: int, channel_axis: int | None, cache_dir: str
+) -> pd.DataFrame:
+    """
+    Return the statistics of each well (see compute_well_stats), cached in
+    ``cache_dir`` and recomputed if the wells or the metadata of their arrays
+    change (e.g. their shape or dtype). Chunks rewritten in place aren't
+    noticed: delete the cache to recompute them.
+    """
+    cache_path = _cache_path(scan, level, cache_dir)
+    if os.path.exists(cache_path):
+        return pd.read_csv(cache_path)
+    with tracing.timed("compute_well_stats"):
+        table = compute_well_stats(scan, level, channel_axis)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    table.to_csv(cache_path, index=False)
+    return table
+
+
+def stats_heatmap(table: pd.DataFrame, layout: PlateLayout) -> np.ndarray:
+    """
+    The statistics as an array of (statistic, channel, row, column), with
+    NaN where there's no well.
+    """
+    channels = int(table["channel"].max()) + 1 if len(table) else 1
+    heatmap = np.full(
+        (len(STATISTICS), channels, len(layout.rows), len(layout.columns)), np.nan
+    )
+    rows = table["row"].to_numpy()
+    cols = table["column"].to_numpy()
+    chs = table["channel"].to_numpy()
+    for index, name in enumerate(STATISTICS):
+        heatmap[index, chs, rows, cols] = table[name].to_numpy()
+    return heatmap